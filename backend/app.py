@@ -2,40 +2,68 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 import pyodbc
-import json
-import threading
-import queue
+import os
+import atexit
 import time
 from datetime import datetime
 import logging
 
+from backpressure import BoundedEventQueue
+from config import (app_config, broadcast_config, cache_config, db_config, dispatch_config, event_config,
+                    outbox_config, queue_config)
+from db_pool import ConnectionPool
+from event_consumer import EventConsumer
+from etag import CollectionVersions, not_modified, tag_response
+from event_handlers import SUBSCRIBERS
+import json_codec
+from json_codec import CodecJSONProvider
+from metrics import PUBLISH_SECONDS, Callback, instrument_app, metrics_response
+from outbox import OutboxWorker, event_from_row, stage_events
+from pagination import PaginationError, encode_cursor, parse_event_query
+from read_cache import ReadCache
+from bulk import BulkPayloadError, bulk_status, chunked, parse_bulk_body, validate_transaction, validate_user
+from streaming import iter_rows, stream_response, wants_ndjson, wants_stream
+from socket_broadcast import EventBroadcaster
+from subscriber_dispatch import Countdown, SubscriberDispatcher
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
-CORS(app, origins=["http://localhost:3000"])
-socketio = SocketIO(app, cors_allowed_origins="http://localhost:3000")
-
-# Event Queue for Event-Driven Architecture
-event_queue = queue.Queue()
-
-# Database configuration
-DB_CONFIG = {
-    'server': 'localhost',
-    'database': 'FinaTechDB',
-    'username': 'sa',
-    'password': 'your_password',
-    'driver': '{ODBC Driver 17 for SQL Server}'
-}
+app.json = CodecJSONProvider(app)
+instrument_app(app)
+CORS(app, origins=["http://localhost:3000"], expose_headers=["X-Next-Cursor", "ETag"])
+# With SOCKETIO_MESSAGE_QUEUE set, event_worker.py processes can emit to this server's clients
+socketio = SocketIO(app, cors_allowed_origins="http://localhost:3000",
+                    message_queue=app_config.socketio_message_queue or None, json=json_codec)
+
+# Event Queue for Event-Driven Architecture, bounded with an overflow policy (EVENT_QUEUE_OVERFLOW)
+event_queue = BoundedEventQueue(
+    maxsize=queue_config.max_size,
+    policy=queue_config.overflow,
+    block_timeout=queue_config.block_timeout,
+    shed_types=queue_config.shed_types,
+    retry_after=queue_config.retry_after
+)
+
+# Database connection pool
+db_pool = ConnectionPool(db_config)
+
+# ETags for the listings, bumped after each commit that changes them. Counters are
+# per process: run a single web process, or writes made elsewhere go unnoticed.
+collection_versions = CollectionVersions('users', 'events')
+
+# Serialized user listing, keyed by its ETag so local writes miss it at once. The cache
+# is per process: users created by another process only show up here once the TTL
+# expires (or this process's own outbox worker happens to deliver their user_created).
+user_cache = ReadCache(max_entries=cache_config.user_max_entries, ttl=cache_config.user_ttl)
 
 def get_db_connection():
-    """Get database connection"""
+    """Check out a pooled database connection"""
     try:
-        conn_str = f"DRIVER={DB_CONFIG['driver']};SERVER={DB_CONFIG['server']};DATABASE={DB_CONFIG['database']};UID={DB_CONFIG['username']};PWD={DB_CONFIG['password']}"
-        conn = pyodbc.connect(conn_str)
-        return conn
+        return db_pool.acquire()
     except Exception as e:
         logger.error(f"Database connection error: {e}")
         return None
@@ -43,8 +71,9 @@ def get_db_connection():
 class EventBus:
     """Event Bus for handling events in the system"""
     
-    def __init__(self):
+    def __init__(self, dispatcher=None):
         self.subscribers = {}
+        self.dispatcher = dispatcher
     
     def subscribe(self, event_type, callback):
         """Subscribe to an event type"""
@@ -52,79 +81,192 @@ class EventBus:
             self.subscribers[event_type] = []
         self.subscribers[event_type].append(callback)
     
+    def _notify(self, event, countdown):
+        """Run subscribers inline or hand them to the async dispatcher"""
+        callbacks = self.subscribers.get(event['type'])
+        if not callbacks:
+            return
+        if self.dispatcher:
+            if not self.dispatcher.dispatch(event, list(callbacks), countdown):
+                # Fails the outbox batch, so it rolls back and every event in it is claimed again
+                raise RuntimeError(f"Subscriber backlog full, {event['type']} will be redelivered")
+            return
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Error in event callback: {e}")
+    
     def publish(self, event_type, data):
-        """Publish an event"""
+        """Publish an event that is not tied to a business write (delivered via the outbox)"""
         event = {
             'type': event_type,
             'data': data,
             'timestamp': datetime.now().isoformat()
         }
         
-        # Add to queue for processing
-        event_queue.put(event)
+        # Add to queue; the batch writer stores it in the outbox
+        started = time.perf_counter()
+        queued = event_queue.offer(event)
+        PUBLISH_SECONDS.observe(time.perf_counter() - started, 'queue')
+        if not queued:
+            return
         
-        # Notify subscribers
-        if event_type in self.subscribers:
-            for callback in self.subscribers[event_type]:
-                try:
-                    callback(event)
-                except Exception as e:
-                    logger.error(f"Error in event callback: {e}")
+        logger.info(f"Event published: {event_type}")
+    
+    def deliver(self, events):
+        """Hand events claimed from the outbox to subscribers and WebSocket clients"""
+        # Notify subscribers. The outbox marks the batch processed when this returns, so
+        # wait for async subscribers too: work still queued in memory would die with the process.
+        started = time.perf_counter()
+        countdown = Countdown()
+        for event in events:
+            self._notify(event, countdown)
+        # Bounded so a hung subscriber cannot hold the claim forever; raising fails the
+        # batch, so it rolls back and is claimed again
+        if not countdown.wait(dispatch_config.timeout * len(events)):
+            stalled = ', '.join(f'{label} ({event_type}, {seconds:.1f}s)'
+                                for label, event_type, seconds in self.dispatcher.running())
+            logger.error(f"Subscribers did not finish {len(events)} events in time; running: {stalled or 'none'}")
+            raise RuntimeError(f"Subscribers timed out, {len(events)} events will be redelivered")
+        notified = time.perf_counter()
         
-        # Emit to frontend via WebSocket
-        socketio.emit('event', event)
+        # Emit to frontend via WebSocket (coalesced into events_batch frames)
+        event_broadcaster.add_many(events)
+        PUBLISH_SECONDS.observe(notified - started, 'subscribers')
+        PUBLISH_SECONDS.observe(time.perf_counter() - notified, 'emit')
         
-        logger.info(f"Event published: {event_type}")
+        logger.info(f"Events delivered: {len(events)}")
 
-# Initialize Event Bus
-event_bus = EventBus()
+# Coalesces outgoing events into batched WebSocket frames
+event_broadcaster = EventBroadcaster(
+    socketio,
+    window_ms=broadcast_config.window_ms,
+    max_batch_size=broadcast_config.max_batch_size,
+    max_client_lag=broadcast_config.max_client_lag,
+    # With a message queue other processes' clients are only reachable through their rooms
+    route_to_rooms=bool(app_config.socketio_message_queue)
+)
 
-def event_processor():
-    """Background thread to process events"""
-    while True:
-        try:
-            if not event_queue.empty():
-                event = event_queue.get()
-                # Process event (save to database, trigger other actions, etc.)
-                save_event_to_db(event)
-                event_queue.task_done()
-            time.sleep(0.1)
-        except Exception as e:
-            logger.error(f"Error processing event: {e}")
+# Initialize Event Bus; subscribers run off the request thread unless dispatch mode is 'inline'
+subscriber_dispatcher = None
+if dispatch_config.mode == 'async':
+    subscriber_dispatcher = SubscriberDispatcher(
+        max_workers=dispatch_config.workers,
+        max_pending=dispatch_config.max_pending,
+        per_subscriber_limit=dispatch_config.per_subscriber_limit,
+        timeout=dispatch_config.timeout
+    )
+event_bus = EventBus(subscriber_dispatcher)
+
+# Batch writer statistics
+event_writer_stats = {
+    'batches': 0,
+    'events': 0,
+    'failed_batches': 0,
+    'last_batch_size': 0,
+    'last_flush_ms': 0.0,
+    'max_flush_ms': 0.0
+}
 
-def save_event_to_db(event):
-    """Save event to database"""
+def save_events_to_db(events):
+    """Save a batch of events with a single executemany and one commit"""
+    started = time.perf_counter()
     try:
         conn = get_db_connection()
-        if conn:
+        if not conn:
+            event_writer_stats['failed_batches'] += 1
+            return
+        with conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO Events (event_type, event_data, timestamp)
-                VALUES (?, ?, ?)
-            """, (event['type'], json.dumps(event['data']), event['timestamp']))
+            cursor.fast_executemany = True
+            cursor.executemany("""
+                INSERT INTO Events (event_type, event_data, timestamp, processed)
+                VALUES (?, ?, ?, 0)
+            """, [(event['type'], json_codec.dumps(event['data']), event['timestamp']) for event in events])
             conn.commit()
-            conn.close()
+        collection_versions.bump('events')
+        outbox_worker.notify()
     except Exception as e:
-        logger.error(f"Error saving event to database: {e}")
-
-# Event handlers
-def handle_user_created(event):
-    """Handle user created event"""
-    logger.info(f"User created: {event['data']}")
+        event_writer_stats['failed_batches'] += 1
+        logger.error(f"Error saving {len(events)} events to database: {e}")
+        return
 
-def handle_transaction_processed(event):
-    """Handle transaction processed event"""
-    logger.info(f"Transaction processed: {event['data']}")
+    flush_ms = (time.perf_counter() - started) * 1000
+    event_writer_stats['batches'] += 1
+    event_writer_stats['events'] += len(events)
+    event_writer_stats['last_batch_size'] = len(events)
+    event_writer_stats['last_flush_ms'] = round(flush_ms, 3)
+    event_writer_stats['max_flush_ms'] = round(max(event_writer_stats['max_flush_ms'], flush_ms), 3)
+    logger.info(f"Events flushed: {len(events)} in {flush_ms:.1f} ms")
 
 # Subscribe to events
-event_bus.subscribe('user_created', handle_user_created)
-event_bus.subscribe('transaction_processed', handle_transaction_processed)
+for event_type, callbacks in SUBSCRIBERS.items():
+    for callback in callbacks:
+        event_bus.subscribe(event_type, callback)
+
+def invalidate_user_cache(event):
+    """Drop cached user listings when this process delivers a user_created event.
+
+    Outbox workers compete for events, so this is not a cross-process
+    invalidation; it only shortens staleness when the event lands here.
+    """
+    user_cache.invalidate()
+
+event_bus.subscribe('user_created', invalidate_user_cache)
+
+# Outbox workers: claim committed events, deliver them and mark them processed
+outbox_worker = OutboxWorker(
+    get_db_connection,
+    event_bus.deliver,
+    batch_size=outbox_config.batch_size,
+    poll_interval=outbox_config.poll_interval_ms / 1000,
+    workers=outbox_config.workers
+)
+
+# Background consumer that persists queued events in group-committed batches
+event_consumer = EventConsumer(
+    event_queue,
+    save_events_to_db,
+    batch_size=event_config.batch_size,
+    max_wait=event_config.batch_max_wait_ms / 1000
+)
+
+# Gauges sampled when /api/metrics is scraped
+Callback('finatech_event_queue_depth', 'Events waiting in the in-process queue', event_queue.qsize)
+Callback('finatech_event_queue_high_water', 'Highest event queue depth seen', lambda: event_queue.high_water)
+Callback('finatech_event_queue_events_total', 'Events offered to the queue by outcome',
+         lambda: {(outcome,): event_queue.stats[outcome] for outcome in ('offered', 'blocked', 'shed', 'dropped')},
+         kind='counter', labelnames=('outcome',))
+Callback('finatech_db_pool_connections', 'Pooled database connections by state',
+         lambda: {(state,): count for state, count in db_pool.status().items() if state in ('idle', 'in_use')},
+         labelnames=('state',))
+Callback('finatech_socketio_clients', 'Connected Socket.IO clients', event_broadcaster.client_count)
+Callback('finatech_user_cache_events_total', 'User listing cache lookups and removals by outcome',
+         lambda: {(outcome,): count for outcome, count in user_cache.stats.items()},
+         kind='counter', labelnames=('outcome',))
 
 # API Routes
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'db_pool': db_pool.status(),
+        'event_writer': event_writer_stats,
+        'event_consumer': event_consumer.status(),
+        'event_queue': event_queue.status(),
+        'outbox': outbox_worker.status(),
+        'user_cache': user_cache.status(),
+        'subscribers': subscriber_dispatcher.status() if subscriber_dispatcher else {'mode': 'inline'},
+        'broadcast': event_broadcaster.status()
+    })
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics in the text exposition format"""
+    return metrics_response()
 
 @app.route('/api/users', methods=['POST'])
 def create_user():
@@ -141,51 +283,79 @@ def create_user():
         if not conn:
             return jsonify({'error': 'Database connection failed'}), 500
         
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO Users (name, email, created_at)
-            OUTPUT INSERTED.id
-            VALUES (?, ?, ?)
-        """, (data['name'], data['email'], datetime.now()))
-        
-        user_id = cursor.fetchone()[0]
-        conn.commit()
-        conn.close()
-        
-        # Publish event
-        event_bus.publish('user_created', {
-            'user_id': user_id,
-            'name': data['name'],
-            'email': data['email']
-        })
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO Users (name, email, created_at)
+                OUTPUT INSERTED.id
+                VALUES (?, ?, ?)
+            """, (data['name'], data['email'], datetime.now()))
+            
+            user_id = cursor.fetchone()[0]
+            
+            # Stage the event in the same transaction as the user
+            stage_events(cursor, 'user_created', [{
+                'user_id': user_id,
+                'name': data['name'],
+                'email': data['email']
+            }], datetime.now())
+            conn.commit()
+        collection_versions.bump('users')
+        collection_versions.bump('events')
+        outbox_worker.notify()
         
         return jsonify({'id': user_id, 'message': 'User created successfully'}), 201
         
+    except pyodbc.IntegrityError:
+        return jsonify({'error': 'A user with this email already exists'}), 409
     except Exception as e:
         logger.error(f"Error creating user: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def user_from_row(row):
+    """Convert a Users row to its API representation"""
+    return {
+        'id': row[0],
+        'name': row[1],
+        'email': row[2],
+        'created_at': row[3].isoformat() if row[3] else None
+    }
+
+def load_user_list():
+    """The full user listing, serialized once for user_cache"""
+    conn = get_db_connection()
+    if not conn:
+        raise ConnectionError('Database connection failed')
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, name, email, created_at FROM Users")
+        return json_codec.dumpb([user_from_row(row) for row in cursor.fetchall()])
+
 @app.route('/api/users', methods=['GET'])
 def get_users():
-    """Get all users"""
+    """Get all users (streamed with ?stream=1 or Accept: application/x-ndjson)"""
     try:
-        conn = get_db_connection()
-        if not conn:
+        if wants_stream(request):
+            conn = get_db_connection()
+            if not conn:
+                return jsonify({'error': 'Database connection failed'}), 500
+            # Rows are pulled in chunks while the response is written; iter_rows returns the connection
+            rows = iter_rows(conn, "SELECT id, name, email, created_at FROM Users ORDER BY id")
+            return stream_response((user_from_row(row) for row in rows), ndjson=wants_ndjson(request),
+                                   on_close=rows.close)
+        
+        # Polling clients that already have the current list get a 304 without a query
+        etag = collection_versions.etag('users')
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        
+        try:
+            body = user_cache.get_or_load('users', load_user_list, tag=etag)
+        except ConnectionError:
             return jsonify({'error': 'Database connection failed'}), 500
         
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, email, created_at FROM Users")
-        users = []
-        for row in cursor.fetchall():
-            users.append({
-                'id': row[0],
-                'name': row[1],
-                'email': row[2],
-                'created_at': row[3].isoformat() if row[3] else None
-            })
-        
-        conn.close()
-        return jsonify(users)
+        return tag_response(app.response_class(body, mimetype='application/json'), etag)
         
     except Exception as e:
         logger.error(f"Error fetching users: {e}")
@@ -207,24 +377,26 @@ def create_transaction():
         if not conn:
             return jsonify({'error': 'Database connection failed'}), 500
         
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO Transactions (user_id, amount, transaction_type, created_at)
-            OUTPUT INSERTED.id
-            VALUES (?, ?, ?, ?)
-        """, (data['user_id'], data['amount'], data['type'], datetime.now()))
-        
-        transaction_id = cursor.fetchone()[0]
-        conn.commit()
-        conn.close()
-        
-        # Publish event
-        event_bus.publish('transaction_processed', {
-            'transaction_id': transaction_id,
-            'user_id': data['user_id'],
-            'amount': data['amount'],
-            'type': data['type']
-        })
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO Transactions (user_id, amount, transaction_type, created_at)
+                OUTPUT INSERTED.id
+                VALUES (?, ?, ?, ?)
+            """, (data['user_id'], data['amount'], data['type'], datetime.now()))
+            
+            transaction_id = cursor.fetchone()[0]
+            
+            # Stage the event in the same transaction as the transaction row
+            stage_events(cursor, 'transaction_processed', [{
+                'transaction_id': transaction_id,
+                'user_id': data['user_id'],
+                'amount': data['amount'],
+                'type': data['type']
+            }], datetime.now())
+            conn.commit()
+        collection_versions.bump('events')
+        outbox_worker.notify()
         
         return jsonify({'id': transaction_id, 'message': 'Transaction created successfully'}), 201
         
@@ -232,27 +404,293 @@ def create_transaction():
         logger.error(f"Error creating transaction: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# One seek of IX_Users_Email per submitted address, all in a single round trip
+EXISTING_EMAILS_SQL = """
+    SELECT u.email
+    FROM OPENJSON(?) WITH (email NVARCHAR(255) '$') AS src
+    JOIN Users u ON u.email = src.email
+"""
+
+# HOLDLOCK closes the gap between the conflict check and the insert;
+# rows that lost a race are simply absent from OUTPUT
+BULK_INSERT_USERS_SQL = """
+    MERGE INTO Users WITH (HOLDLOCK) AS t
+    USING OPENJSON(?) WITH (
+        ord INT '$.ord',
+        name NVARCHAR(100) '$.name',
+        email NVARCHAR(255) '$.email'
+    ) AS src
+    ON t.email = src.email
+    WHEN NOT MATCHED THEN
+        INSERT (name, email, created_at)
+        VALUES (src.name, src.email, ?)
+    OUTPUT src.ord, INSERTED.id;
+"""
+
+@app.route('/api/users/bulk', methods=['POST'])
+def create_users_bulk():
+    """Import many users from a JSON array or NDJSON body, reporting email conflicts per row"""
+    try:
+        try:
+            rows = parse_bulk_body(request)
+        except BulkPayloadError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Validate input and drop duplicates within the request itself
+        # (Users.email uses the database's case-insensitive collation)
+        errors = []
+        conflicts = []
+        valid = []
+        seen = {}
+        for index, row in rows:
+            user, error = validate_user(row) if row is not None else (None, 'Invalid JSON')
+            if error:
+                errors.append({'index': index, 'error': error})
+                continue
+            key = user['email'].lower()
+            if key in seen:
+                conflicts.append({'index': index, 'email': user['email'], 'reason': 'duplicate_in_request', 'first_index': seen[key]})
+                continue
+            seen[key] = index
+            user['ord'] = index
+            valid.append(user)
+        
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        inserted = []
+        with conn:
+            cursor = conn.cursor()
+            
+            # Resolve every existing email in one set-based query
+            if valid:
+                cursor.execute(EXISTING_EMAILS_SQL, json_codec.dumps([u['email'] for u in valid]))
+                existing = {row[0].lower() for row in cursor.fetchall()}
+                new_users = []
+                for user in valid:
+                    if user['email'].lower() in existing:
+                        conflicts.append({'index': user['ord'], 'email': user['email'], 'reason': 'exists'})
+                    else:
+                        new_users.append(user)
+                valid = new_users
+            
+            created_at = datetime.now()
+            for batch in chunked(valid):
+                try:
+                    cursor.execute(BULK_INSERT_USERS_SQL, (json_codec.dumps(batch), created_at))
+                    ids = dict(cursor.fetchall())
+                    
+                    # Stage the batch's events in the same transaction
+                    stage_events(cursor, 'user_created', [{
+                        'user_id': ids[u['ord']],
+                        'name': u['name'],
+                        'email': u['email']
+                    } for u in batch if u['ord'] in ids], created_at)
+                    conn.commit()
+                    collection_versions.bump('users')
+                    collection_versions.bump('events')
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Error inserting user batch: {e}")
+                    errors.extend({'index': u['ord'], 'error': 'Batch insert failed'} for u in batch)
+                    continue
+                
+                for user in batch:
+                    if user['ord'] in ids:
+                        user['id'] = ids[user['ord']]
+                        inserted.append(user)
+                    else:
+                        conflicts.append({'index': user['ord'], 'email': user['email'], 'reason': 'exists'})
+        
+        if inserted:
+            outbox_worker.notify()
+        
+        errors.sort(key=lambda error: error['index'])
+        conflicts.sort(key=lambda conflict: conflict['index'])
+        return jsonify({
+            'inserted': len(inserted),
+            'failed': len(errors) + len(conflicts),
+            'ids': [{'index': u['ord'], 'id': u['id']} for u in inserted],
+            'conflicts': conflicts,
+            'errors': errors
+        }), bulk_status(inserted, errors + conflicts)
+        
+    except Exception as e:
+        logger.error(f"Error importing users in bulk: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+MISSING_USERS_SQL = """
+    SELECT DISTINCT src.user_id
+    FROM OPENJSON(?) WITH (user_id INT '$.user_id') AS src
+    WHERE NOT EXISTS (SELECT 1 FROM Users u WHERE u.id = src.user_id)
+"""
+
+# MERGE (rather than INSERT) can OUTPUT source columns, which maps each new id back to its row
+BULK_INSERT_TRANSACTIONS_SQL = """
+    MERGE INTO Transactions AS t
+    USING OPENJSON(?) WITH (
+        ord INT '$.ord',
+        user_id INT '$.user_id',
+        amount DECIMAL(10,2) '$.amount',
+        transaction_type NVARCHAR(50) '$.type'
+    ) AS src
+    ON 1 = 0
+    WHEN NOT MATCHED THEN
+        INSERT (user_id, amount, transaction_type, created_at)
+        VALUES (src.user_id, src.amount, src.transaction_type, ?)
+    OUTPUT src.ord, INSERTED.id;
+"""
+
+@app.route('/api/transactions/bulk', methods=['POST'])
+def create_transactions_bulk():
+    """Create many transactions from a JSON array or NDJSON body"""
+    try:
+        try:
+            rows = parse_bulk_body(request)
+        except BulkPayloadError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Validate input
+        errors = []
+        valid = []
+        for index, row in rows:
+            transaction, error = validate_transaction(row) if row is not None else (None, 'Invalid JSON')
+            if error:
+                errors.append({'index': index, 'error': error})
+            else:
+                transaction['ord'] = index
+                valid.append(transaction)
+        
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        inserted = []
+        with conn:
+            cursor = conn.cursor()
+            for batch in chunked(valid):
+                try:
+                    cursor.execute(MISSING_USERS_SQL, json_codec.dumps([{'user_id': t['user_id']} for t in batch]))
+                    missing = {row[0] for row in cursor.fetchall()}
+                    if missing:
+                        for transaction in batch:
+                            if transaction['user_id'] in missing:
+                                errors.append({'index': transaction['ord'], 'error': 'User not found'})
+                        batch = [t for t in batch if t['user_id'] not in missing]
+                    if not batch:
+                        continue
+                    
+                    payload = json_codec.dumps([dict(t, amount=str(t['amount'])) for t in batch])
+                    created_at = datetime.now()
+                    cursor.execute(BULK_INSERT_TRANSACTIONS_SQL, (payload, created_at))
+                    ids = dict(cursor.fetchall())
+                    
+                    # Stage the batch's events in the same transaction
+                    stage_events(cursor, 'transaction_processed', [{
+                        'transaction_id': ids[t['ord']],
+                        'user_id': t['user_id'],
+                        'amount': float(t['amount']),
+                        'type': t['type']
+                    } for t in batch], created_at)
+                    conn.commit()
+                    collection_versions.bump('events')
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Error inserting transaction batch: {e}")
+                    errors.extend({'index': t['ord'], 'error': 'Batch insert failed'} for t in batch)
+                    continue
+                
+                for transaction in batch:
+                    transaction['id'] = ids[transaction['ord']]
+                    inserted.append(transaction)
+        
+        if inserted:
+            outbox_worker.notify()
+        
+        errors.sort(key=lambda error: error['index'])
+        return jsonify({
+            'inserted': len(inserted),
+            'failed': len(errors),
+            'ids': [{'index': t['ord'], 'id': t['id']} for t in inserted],
+            'errors': errors
+        }), bulk_status(inserted, errors)
+        
+    except Exception as e:
+        logger.error(f"Error creating transactions in bulk: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def build_events_query(query):
+    """Build the keyset-paginated events query.
+
+    Filtering on event_type plus a timestamp range and ordering by
+    (timestamp, id) lets SQL Server seek IX_Events_Type_Timestamp (whose rows
+    carry the clustered id) and stop after TOP rows instead of sorting the table.
+    """
+    clauses = []
+    params = [query['limit'] + 1] if query['limit'] else []
+    if query['type']:
+        clauses.append("event_type = ?")
+        params.append(query['type'])
+    if query['since']:
+        clauses.append("timestamp >= ?")
+        params.append(query['since'])
+    if query['until']:
+        clauses.append("timestamp < ?")
+        params.append(query['until'])
+    if query['cursor']:
+        cursor_timestamp, cursor_id = query['cursor']
+        clauses.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+        params.extend([cursor_timestamp, cursor_timestamp, cursor_id])
+
+    sql = "SELECT id, event_type, event_data, timestamp FROM Events"
+    if query['limit']:
+        sql = "SELECT TOP (?) id, event_type, event_data, timestamp FROM Events"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY timestamp DESC, id DESC"
+    return sql, params
+
 @app.route('/api/events', methods=['GET'])
 def get_events():
-    """Get all events"""
+    """Get a page of events, newest first, filtered by type/since/until (streamed with ?stream=1)"""
     try:
+        try:
+            query = parse_event_query(request.args)
+        except PaginationError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        etag = collection_versions.etag('events')
+        cached = None if wants_stream(request) else not_modified(request, etag)
+        if cached:
+            return cached
+        
         conn = get_db_connection()
         if not conn:
             return jsonify({'error': 'Database connection failed'}), 500
         
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, event_type, event_data, timestamp FROM Events ORDER BY timestamp DESC")
-        events = []
-        for row in cursor.fetchall():
-            events.append({
-                'id': row[0],
-                'type': row[1],
-                'data': json.loads(row[2]) if row[2] else {},
-                'timestamp': row[3].isoformat() if row[3] else None
-            })
-        
-        conn.close()
-        return jsonify(events)
+        if wants_stream(request):
+            # Export every matching event from the cursor position onwards
+            sql, params = build_events_query(dict(query, limit=None))
+            rows = iter_rows(conn, sql, params)
+            return stream_response((event_from_row(row) for row in rows), ndjson=wants_ndjson(request),
+                                   on_close=rows.close)
+        
+        with conn:
+            cursor = conn.cursor()
+            sql, params = build_events_query(query)
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        
+        next_cursor = None
+        if len(rows) > query['limit']:
+            rows = rows[:query['limit']]
+            next_cursor = encode_cursor(rows[-1][3], rows[-1][0])
+        
+        response = jsonify([event_from_row(row) for row in rows])
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return tag_response(response, etag)
         
     except Exception as e:
         logger.error(f"Error fetching events: {e}")
@@ -264,16 +702,54 @@ def handle_connect():
     """Handle client connection"""
     logger.info('Client connected')
     emit('message', {'data': 'Connected to FinaTech Event System'})
+    event_broadcaster.client_connected(request.sid)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
     logger.info('Client disconnected')
+    event_broadcaster.client_disconnected(request.sid)
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Join event rooms, e.g. {'types': ['transaction_processed'], 'user_ids': [42]} or {'types': ['*']}"""
+    emit('subscriptions', {'rooms': event_broadcaster.subscribe(request.sid, data)})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """Leave event rooms"""
+    emit('subscriptions', {'rooms': event_broadcaster.unsubscribe(request.sid, data)})
+
+@socketio.on('events_ack')
+def handle_events_ack(data):
+    """Record the last events_batch frame a client has processed"""
+    event_broadcaster.ack(request.sid, (data or {}).get('seq'))
+
+@socketio.on('events_resume')
+def handle_events_resume():
+    """Rejoin live events after a resync_required notice"""
+    event_broadcaster.resume(request.sid)
 
 if __name__ == '__main__':
-    # Start event processor thread
-    event_thread = threading.Thread(target=event_processor, daemon=True)
-    event_thread.start()
+    # debug=True runs this file twice: a reloader parent that only watches for code
+    # changes and a child (WERKZEUG_RUN_MAIN set) that serves. An outbox worker in the
+    # parent would claim events and emit them to a broadcaster without clients.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Start event processor thread and drain it on shutdown
+        event_consumer.start()
+        atexit.register(event_consumer.stop)
+        if subscriber_dispatcher:
+            atexit.register(subscriber_dispatcher.shutdown)
+        event_broadcaster.start()
+        atexit.register(event_broadcaster.stop)
+        outbox_worker.start()
+        atexit.register(outbox_worker.stop)
+        
+        # Warm up the connection pool
+        try:
+            db_pool.fill()
+        except Exception as e:
+            logger.error(f"Could not pre-fill connection pool: {e}")
     
     # Run the application
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
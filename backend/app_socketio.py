@@ -1,29 +1,43 @@
 from flask import Flask, request, jsonify
 from flask_socketio import SocketIO, emit
 import json
-import threading
-import queue
-import time
+import atexit
 from datetime import datetime
 import logging
 
+from backpressure import BoundedEventQueue
+from bulk import validate_transaction
+from config import queue_config
+from event_consumer import EventConsumer
+import json_codec
+from json_codec import CodecJSONProvider
+from memory_store import DuplicateEmailError, InMemoryRepository
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
+app.json = CodecJSONProvider(app)
 
 # Initialize SocketIO with CORS support
-socketio = SocketIO(app, cors_allowed_origins="*", logger=True, engineio_logger=True)
+socketio = SocketIO(app, cors_allowed_origins="*", logger=True, engineio_logger=True, json=json_codec)
 
-# Event Queue for Event-Driven Architecture
-event_queue = queue.Queue()
+# Event Queue for Event-Driven Architecture, bounded with an overflow policy (EVENT_QUEUE_OVERFLOW)
+event_queue = BoundedEventQueue(
+    maxsize=queue_config.max_size,
+    policy=queue_config.overflow,
+    block_timeout=queue_config.block_timeout,
+    shed_types=queue_config.shed_types,
+    retry_after=queue_config.retry_after
+)
 
-# In-memory storage (for demo without database)
-users_db = []
-transactions_db = []
-events_db = []
+# In-memory storage (for demo without database), indexed by id, email, user_id and event type
+repository = InMemoryRepository()
+users_db = repository.users
+transactions_db = repository.transactions
+events_db = repository.events
 
 class EventBus:
     """Event Bus for handling events in the system"""
@@ -37,17 +51,20 @@ class EventBus:
             self.subscribers[event_type] = []
         self.subscribers[event_type].append(callback)
     
-    def publish(self, event_type, data):
-        """Publish an event"""
+    def publish(self, event_type, data, reservation=None):
+        """Publish an event; reservation is event queue room the caller reserved before its write"""
         event = {
             'type': event_type,
             'data': data,
             'timestamp': datetime.now().isoformat(),
-            'id': len(events_db) + 1
+            'id': repository.next_event_id()
         }
         
-        # Add to queue for processing
-        event_queue.put(event)
+        # Add to queue for processing; an event shed or dropped on overflow goes nowhere
+        if reservation is not None:
+            reservation.put(event)
+        elif not event_queue.offer(event):
+            return None
         
         # Notify subscribers
         if event_type in self.subscribers:
@@ -66,23 +83,15 @@ class EventBus:
 # Initialize Event Bus
 event_bus = EventBus()
 
-def event_processor():
-    """Background thread to process events"""
-    while True:
-        try:
-            if not event_queue.empty():
-                event = event_queue.get()
-                # Process event (save to in-memory storage)
-                save_event_to_storage(event)
-                event_queue.task_done()
-            time.sleep(0.1)
-        except Exception as e:
-            logger.error(f"Error processing event: {e}")
+def process_events(events):
+    """Process a batch of events (save to in-memory storage)"""
+    for event in events:
+        save_event_to_storage(event)
 
 def save_event_to_storage(event):
     """Save event to in-memory storage"""
     try:
-        events_db.append(event)
+        repository.add_event(event)
         logger.info(f"Event saved: {event['type']}")
     except Exception as e:
         logger.error(f"Error saving event: {e}")
@@ -100,6 +109,9 @@ def handle_transaction_processed(event):
 event_bus.subscribe('user_created', handle_user_created)
 event_bus.subscribe('transaction_processed', handle_transaction_processed)
 
+# Background consumer that wakes up as soon as an event is queued
+event_consumer = EventConsumer(event_queue, process_events)
+
 # Add CORS headers manually for regular HTTP requests
 @app.after_request
 def after_request(response):
@@ -108,6 +120,11 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     return response
 
+# Load shedding: writes reserve event queue room before changing anything
+def overloaded():
+    """503 with Retry-After for a write the event queue has no room for"""
+    return jsonify({'error': 'Server is overloaded, please retry'}), 503, {'Retry-After': str(event_queue.retry_after)}
+
 # API Routes
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -118,7 +135,9 @@ def health_check():
         'socketio': 'enabled',
         'events_count': len(events_db),
         'users_count': len(users_db),
-        'transactions_count': len(transactions_db)
+        'transactions_count': len(transactions_db),
+        'event_consumer': event_consumer.status(),
+        'event_queue': event_queue.status()
     })
 
 @app.route('/api/users', methods=['POST'])
@@ -131,23 +150,25 @@ def create_user():
         if not data or 'name' not in data or 'email' not in data:
             return jsonify({'error': 'Name and email are required'}), 400
         
-        # Create user
-        user_id = len(users_db) + 1
-        user = {
-            'id': user_id,
-            'name': data['name'],
-            'email': data['email'],
-            'created_at': datetime.now().isoformat()
-        }
-        
-        users_db.append(user)
-        
-        # Publish event
-        event_bus.publish('user_created', {
-            'user_id': user_id,
-            'name': data['name'],
-            'email': data['email']
-        })
+        # Room for the event is reserved first, so an overloaded queue refuses the
+        # request instead of leaving a user without its user_created event
+        reservation = event_queue.reserve('user_created')
+        if reservation is None:
+            return overloaded()
+        with reservation:
+            # Create user
+            try:
+                user = repository.add_user(data['name'], data['email'])
+            except DuplicateEmailError:
+                return jsonify({'error': 'A user with this email already exists'}), 409
+            user_id = user['id']
+            
+            # Publish event
+            event_bus.publish('user_created', {
+                'user_id': user_id,
+                'name': data['name'],
+                'email': data['email']
+            }, reservation)
         
         return jsonify({'id': user_id, 'message': 'User created successfully'}), 201
         
@@ -170,30 +191,29 @@ def create_transaction():
     try:
         data = request.get_json()
         
-        # Validate input
-        required_fields = ['user_id', 'amount', 'type']
-        if not data or not all(field in data for field in required_fields):
-            return jsonify({'error': 'user_id, amount, and type are required'}), 400
+        # Validate input (same rules as the bulk endpoint)
+        row, error = validate_transaction(data)
+        if error:
+            return jsonify({'error': error}), 400
         
         # Create transaction
-        transaction_id = len(transactions_db) + 1
-        transaction = {
-            'id': transaction_id,
-            'user_id': int(data['user_id']),
-            'amount': float(data['amount']),
-            'type': data['type'],
-            'created_at': datetime.now().isoformat()
-        }
-        
-        transactions_db.append(transaction)
-        
-        # Publish event
-        event_bus.publish('transaction_processed', {
-            'transaction_id': transaction_id,
-            'user_id': data['user_id'],
-            'amount': data['amount'],
-            'type': data['type']
-        })
+        user_id, amount = row['user_id'], row['amount']
+        if repository.get_user(user_id) is None:
+            return jsonify({'error': 'User not found'}), 404
+        reservation = event_queue.reserve('transaction_processed')
+        if reservation is None:
+            return overloaded()
+        with reservation:
+            transaction = repository.add_transaction(user_id, amount, row['type'])
+            transaction_id = transaction['id']
+            
+            # Publish event
+            event_bus.publish('transaction_processed', {
+                'transaction_id': transaction_id,
+                'user_id': user_id,
+                'amount': transaction['amount'],
+                'type': transaction['type']
+            }, reservation)
         
         return jsonify({'id': transaction_id, 'message': 'Transaction created successfully'}), 201
         
@@ -201,6 +221,38 @@ def create_transaction():
         logger.error(f"Error creating transaction: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/users/<int:user_id>', methods=['GET'])
+def get_user(user_id):
+    """Get a user by id"""
+    user = repository.get_user(user_id)
+    if user is None:
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify(user)
+
+@app.route('/api/users/<int:user_id>/transactions', methods=['GET'])
+def get_user_transactions(user_id):
+    """Get a user's transactions"""
+    if repository.get_user(user_id) is None:
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify(repository.transactions_for_user(user_id))
+
+@app.route('/api/transactions/summary', methods=['GET'])
+def get_transaction_summary():
+    """Aggregate transactions (optionally ?user_id= and/or ?type=) over whole columns"""
+    try:
+        user_id = int(request.args['user_id']) if request.args.get('user_id') else None
+    except ValueError:
+        return jsonify({'error': 'user_id must be an integer'}), 400
+    return jsonify(repository.transactions.summary(user_id, request.args.get('type') or None))
+
+@app.route('/api/transactions/<int:transaction_id>', methods=['GET'])
+def get_transaction(transaction_id):
+    """Get a transaction by id"""
+    transaction = repository.get_transaction(transaction_id)
+    if transaction is None:
+        return jsonify({'error': 'Transaction not found'}), 404
+    return jsonify(transaction)
+
 @app.route('/api/events', methods=['GET'])
 def get_events():
     """Get all events"""
@@ -245,18 +297,12 @@ def handle_get_users():
     emit('users_update', users_db)
 
 if __name__ == '__main__':
-    # Start event processor thread
-    event_thread = threading.Thread(target=event_processor, daemon=True)
-    event_thread.start()
+    # Start event processor thread and drain it on shutdown
+    event_consumer.start()
+    atexit.register(event_consumer.stop)
     
     # Add some sample data
-    sample_user = {
-        'id': 1,
-        'name': 'John Doe',
-        'email': 'john.doe@example.com',
-        'created_at': datetime.now().isoformat()
-    }
-    users_db.append(sample_user)
+    repository.add_user('John Doe', 'john.doe@example.com')
     
     # Publish initial event
     event_bus.publish('system_started', {
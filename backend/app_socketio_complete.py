@@ -1,35 +1,88 @@
 from flask import Flask, request, jsonify
 from flask_socketio import SocketIO, emit
+import os
 import json
+import atexit
 import threading
-import queue
 import time
 from datetime import datetime
 import logging
 
+from backpressure import BoundedEventQueue
+from bulk import validate_transaction
+from config import broadcast_config, dispatch_config, queue_config, storage_config
+from event_consumer import EventConsumer
+import json_codec
+from json_codec import CodecJSONProvider
+from etag import not_modified, tag_response
+from event_log import EventLog
+from memory_store import DuplicateEmailError, InMemoryRepository
+from metrics import PUBLISH_SECONDS, Callback, instrument_app, metrics_response
+from pagination import PaginationError, encode_cursor, paginate_events, parse_event_query
+from snapshot import Snapshotter
+from socket_broadcast import EventBroadcaster
+from subscriber_dispatch import SubscriberDispatcher
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
+app.json = CodecJSONProvider(app)
+instrument_app(app)
 
 # Initialize SocketIO with CORS support
-socketio = SocketIO(app, cors_allowed_origins="*", logger=False, engineio_logger=False)
+socketio = SocketIO(app, cors_allowed_origins="*", logger=False, engineio_logger=False, json=json_codec)
+
+# Event Queue for Event-Driven Architecture, bounded with an overflow policy (EVENT_QUEUE_OVERFLOW)
+event_queue = BoundedEventQueue(
+    maxsize=queue_config.max_size,
+    policy=queue_config.overflow,
+    block_timeout=queue_config.block_timeout,
+    shed_types=queue_config.shed_types,
+    retry_after=queue_config.retry_after
+)
+
+# In-memory storage (for demo without database), indexed by id, email, user_id and event type
+repository = InMemoryRepository()
+users_db = repository.users
+transactions_db = repository.transactions
+events_db = repository.events
 
-# Event Queue for Event-Driven Architecture
-event_queue = queue.Queue()
+# Optional durable, append-only event log plus snapshots for the no-database mode.
+# Only the serving process opens the log (see __main__); open() locks its directory.
+event_log = None
+snapshotter = None
+if storage_config.event_log_dir:
+    event_log = EventLog(
+        storage_config.event_log_dir,
+        segment_size=storage_config.segment_bytes,
+        fsync=storage_config.fsync,
+        fsync_interval=storage_config.fsync_interval
+    )
+    snapshotter = Snapshotter(
+        storage_config.snapshot_dir or os.path.join(storage_config.event_log_dir, 'snapshots'),
+        repository,
+        event_log,
+        interval=storage_config.snapshot_interval,
+        min_events=storage_config.snapshot_min_events,
+        retain=storage_config.snapshot_retain
+    )
 
-# In-memory storage (for demo without database)
-users_db = []
-transactions_db = []
-events_db = []
+# Longest a resuming client waits for queued events to reach the store (seconds)
+RESUME_STORE_WAIT = 2.0
+
+# Startup timings, reported by /api/health
+cold_start = {'cold_start_ms': None, 'snapshot_events': 0, 'replayed_events': 0}
 
 class EventBus:
     """Event Bus for handling events in the system"""
     
-    def __init__(self):
+    def __init__(self, dispatcher=None):
         self.subscribers = {}
+        self.dispatcher = dispatcher
+        self._publish_lock = threading.Lock()
     
     def subscribe(self, event_type, callback):
         """Subscribe to an event type"""
@@ -37,52 +90,104 @@ class EventBus:
             self.subscribers[event_type] = []
         self.subscribers[event_type].append(callback)
     
-    def publish(self, event_type, data):
-        """Publish an event"""
-        event = {
-            'type': event_type,
-            'data': data,
-            'timestamp': datetime.now().isoformat(),
-            'id': len(events_db) + 1
-        }
+    def _notify(self, event):
+        """Run subscribers inline or hand them to the async dispatcher"""
+        callbacks = self.subscribers.get(event['type'])
+        if not callbacks:
+            return
+        if self.dispatcher:
+            self.dispatcher.dispatch(event, list(callbacks))
+            return
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Error in event callback: {e}")
+    
+    def publish(self, event_type, data, reservation=None):
+        """Publish an event; reservation is event queue room the caller reserved before its write"""
+        # Waiting for room happens outside the lock, so a full queue doesn't serialize
+        # publishers; the put below never blocks
+        started = time.perf_counter()
+        if reservation is None:
+            reservation = event_queue.reserve(event_type)
+            if reservation is None:
+                logger.error(f"Event queue full, dropped {event_type}")
+                return None
         
-        # Add to queue for processing
-        event_queue.put(event)
+        # Ids double as the resume sequence: allocating and enqueueing under one lock
+        # keeps the event store and the WebSocket stream in id order
+        with self._publish_lock:
+            event = {
+                'type': event_type,
+                'data': data,
+                'timestamp': datetime.now().isoformat(),
+                'id': repository.next_event_id()
+            }
+            reservation.put(event)
+            enqueued = time.perf_counter()
+            PUBLISH_SECONDS.observe(enqueued - started, 'queue')
+            
+            # Emit to frontend via WebSocket (coalesced into events_batch frames)
+            event_broadcaster.add(event)
+            emitted = time.perf_counter()
         
         # Notify subscribers
-        if event_type in self.subscribers:
-            for callback in self.subscribers[event_type]:
-                try:
-                    callback(event)
-                except Exception as e:
-                    logger.error(f"Error in event callback: {e}")
-        
-        # Emit to frontend via WebSocket
-        socketio.emit('event', event)
+        self._notify(event)
+        PUBLISH_SECONDS.observe(emitted - enqueued, 'emit')
+        PUBLISH_SECONDS.observe(time.perf_counter() - emitted, 'subscribers')
         
         logger.info(f"📡 Event published: {event_type}")
         return event
 
-# Initialize Event Bus
-event_bus = EventBus()
+# Coalesces outgoing events into batched WebSocket frames
+event_broadcaster = EventBroadcaster(
+    socketio,
+    window_ms=broadcast_config.window_ms,
+    max_batch_size=broadcast_config.max_batch_size,
+    max_client_lag=broadcast_config.max_client_lag,
+    resume_chunk_size=broadcast_config.resume_chunk_size,
+    resume_max_events=broadcast_config.resume_max_events
+)
 
-def event_processor():
-    """Background thread to process events"""
-    while True:
-        try:
-            if not event_queue.empty():
-                event = event_queue.get()
-                # Process event (save to in-memory storage)
-                save_event_to_storage(event)
-                event_queue.task_done()
-            time.sleep(0.1)
-        except Exception as e:
-            logger.error(f"Error processing event: {e}")
+# Initialize Event Bus; subscribers run off the request thread unless dispatch mode is 'inline'
+subscriber_dispatcher = None
+if dispatch_config.mode == 'async':
+    subscriber_dispatcher = SubscriberDispatcher(
+        max_workers=dispatch_config.workers,
+        max_pending=dispatch_config.max_pending,
+        per_subscriber_limit=dispatch_config.per_subscriber_limit,
+        timeout=dispatch_config.timeout
+    )
+event_bus = EventBus(subscriber_dispatcher)
+
+def process_events(events):
+    """Process a batch of events (save to in-memory storage, then append to the event log)"""
+    for event in events:
+        save_event_to_storage(event)
+    # Logged after storing, so a snapshot's log position never covers events missing from its copy
+    if event_log is not None:
+        event_log.append_many(events)
+
+def restore_from_event_log():
+    """Load the newest snapshot, then replay only the event log written after it"""
+    started = time.perf_counter()
+    meta = snapshotter.load()
+    position = tuple(meta['log_position']) if meta else None
+    users, transactions = repository.restore(event_log.replay(position))
+    cold_start.update({
+        'cold_start_ms': round((time.perf_counter() - started) * 1000, 1),
+        'snapshot_events': meta['events'] if meta else 0,
+        'replayed_events': len(events_db) - (meta['events'] if meta else 0)
+    })
+    logger.info(f"♻️ Restored {len(events_db)} events ({cold_start['snapshot_events']} from snapshot, "
+                f"{cold_start['replayed_events']} replayed; {users} users and {transactions} transactions "
+                f"from the log tail) in {cold_start['cold_start_ms']:.0f} ms")
 
 def save_event_to_storage(event):
     """Save event to in-memory storage"""
     try:
-        events_db.append(event)
+        repository.add_event(event)
         logger.info(f"💾 Event saved: {event['type']}")
     except Exception as e:
         logger.error(f"Error saving event: {e}")
@@ -100,14 +205,31 @@ def handle_transaction_processed(event):
 event_bus.subscribe('user_created', handle_user_created)
 event_bus.subscribe('transaction_processed', handle_transaction_processed)
 
+# Background consumer that wakes up as soon as an event is queued
+event_consumer = EventConsumer(event_queue, process_events)
+
 # Add CORS headers manually for regular HTTP requests
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,If-None-Match')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+    response.headers.add('Access-Control-Expose-Headers', 'X-Next-Cursor, ETag')
     return response
 
+# Load shedding: writes reserve event queue room before changing anything
+def overloaded():
+    """503 with Retry-After for a write the event queue has no room for"""
+    return jsonify({'error': 'Server is overloaded, please retry'}), 503, {'Retry-After': str(event_queue.retry_after)}
+
+# Gauges sampled when /api/metrics is scraped
+Callback('finatech_event_queue_depth', 'Events waiting in the in-process queue', event_queue.qsize)
+Callback('finatech_event_queue_high_water', 'Highest event queue depth seen', lambda: event_queue.high_water)
+Callback('finatech_event_queue_events_total', 'Events offered to the queue by outcome',
+         lambda: {(outcome,): event_queue.stats[outcome] for outcome in ('offered', 'blocked', 'shed', 'dropped')},
+         kind='counter', labelnames=('outcome',))
+Callback('finatech_socketio_clients', 'Connected Socket.IO clients', event_broadcaster.client_count)
+
 # API Routes
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -119,10 +241,22 @@ def health_check():
         'events_count': len(events_db),
         'users_count': len(users_db),
         'transactions_count': len(transactions_db),
+        'event_consumer': event_consumer.status(),
+        'event_queue': event_queue.status(),
+        'event_log': event_log.status() if event_log is not None else None,
+        'snapshots': snapshotter.status() if snapshotter else None,
+        'startup': cold_start,
+        'subscribers': subscriber_dispatcher.status() if subscriber_dispatcher else {'mode': 'inline'},
+        'broadcast': event_broadcaster.status(),
         'event_driven_architecture': 'active',
         'websocket_support': True
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics in the text exposition format"""
+    return metrics_response()
+
 @app.route('/api/users', methods=['POST'])
 def create_user():
     """Create a new user"""
@@ -133,23 +267,25 @@ def create_user():
         if not data or 'name' not in data or 'email' not in data:
             return jsonify({'error': 'Name and email are required'}), 400
         
-        # Create user
-        user_id = len(users_db) + 1
-        user = {
-            'id': user_id,
-            'name': data['name'],
-            'email': data['email'],
-            'created_at': datetime.now().isoformat()
-        }
-        
-        users_db.append(user)
-        
-        # Publish event
-        event_bus.publish('user_created', {
-            'user_id': user_id,
-            'name': data['name'],
-            'email': data['email']
-        })
+        # Room for the event is reserved first, so an overloaded queue refuses the
+        # request instead of leaving a user without its user_created event
+        reservation = event_queue.reserve('user_created')
+        if reservation is None:
+            return overloaded()
+        with reservation:
+            # Create user
+            try:
+                user = repository.add_user(data['name'], data['email'])
+            except DuplicateEmailError:
+                return jsonify({'error': 'A user with this email already exists'}), 409
+            user_id = user['id']
+            
+            # Publish event
+            event_bus.publish('user_created', {
+                'user_id': user_id,
+                'name': data['name'],
+                'email': data['email']
+            }, reservation)
         
         return jsonify({'id': user_id, 'message': 'User created successfully'}), 201
         
@@ -159,9 +295,13 @@ def create_user():
 
 @app.route('/api/users', methods=['GET'])
 def get_users():
-    """Get all users"""
+    """Get all users (304 when If-None-Match names the current version)"""
     try:
-        return jsonify(users_db)
+        etag = repository.versions.etag('users')
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        return tag_response(jsonify(users_db), etag)
     except Exception as e:
         logger.error(f"Error fetching users: {e}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -172,30 +312,29 @@ def create_transaction():
     try:
         data = request.get_json()
         
-        # Validate input
-        required_fields = ['user_id', 'amount', 'type']
-        if not data or not all(field in data for field in required_fields):
-            return jsonify({'error': 'user_id, amount, and type are required'}), 400
+        # Validate input (same rules as the bulk endpoint)
+        row, error = validate_transaction(data)
+        if error:
+            return jsonify({'error': error}), 400
         
         # Create transaction
-        transaction_id = len(transactions_db) + 1
-        transaction = {
-            'id': transaction_id,
-            'user_id': int(data['user_id']),
-            'amount': float(data['amount']),
-            'type': data['type'],
-            'created_at': datetime.now().isoformat()
-        }
-        
-        transactions_db.append(transaction)
-        
-        # Publish event
-        event_bus.publish('transaction_processed', {
-            'transaction_id': transaction_id,
-            'user_id': data['user_id'],
-            'amount': data['amount'],
-            'type': data['type']
-        })
+        user_id, amount = row['user_id'], row['amount']
+        if repository.get_user(user_id) is None:
+            return jsonify({'error': 'User not found'}), 404
+        reservation = event_queue.reserve('transaction_processed')
+        if reservation is None:
+            return overloaded()
+        with reservation:
+            transaction = repository.add_transaction(user_id, amount, row['type'])
+            transaction_id = transaction['id']
+            
+            # Publish event
+            event_bus.publish('transaction_processed', {
+                'transaction_id': transaction_id,
+                'user_id': user_id,
+                'amount': transaction['amount'],
+                'type': transaction['type']
+            }, reservation)
         
         return jsonify({'id': transaction_id, 'message': 'Transaction created successfully'}), 201
         
@@ -203,12 +342,74 @@ def create_transaction():
         logger.error(f"Error creating transaction: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/users/<int:user_id>', methods=['GET'])
+def get_user(user_id):
+    """Get a user by id"""
+    user = repository.get_user(user_id)
+    if user is None:
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify(user)
+
+@app.route('/api/users/<int:user_id>/transactions', methods=['GET'])
+def get_user_transactions(user_id):
+    """Get a user's transactions"""
+    if repository.get_user(user_id) is None:
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify(repository.transactions_for_user(user_id))
+
+@app.route('/api/transactions/summary', methods=['GET'])
+def get_transaction_summary():
+    """Aggregate transactions (optionally ?user_id= and/or ?type=) over whole columns"""
+    try:
+        user_id = int(request.args['user_id']) if request.args.get('user_id') else None
+    except ValueError:
+        return jsonify({'error': 'user_id must be an integer'}), 400
+    return jsonify(repository.transactions.summary(user_id, request.args.get('type') or None))
+
+@app.route('/api/transactions/<int:transaction_id>', methods=['GET'])
+def get_transaction(transaction_id):
+    """Get a transaction by id"""
+    transaction = repository.get_transaction(transaction_id)
+    if transaction is None:
+        return jsonify({'error': 'Transaction not found'}), 404
+    return jsonify(transaction)
+
+@app.route('/api/events/<int:event_id>', methods=['GET'])
+def get_event(event_id):
+    """Get an event by id, falling back to the on-disk event log"""
+    event = repository.get_event(event_id)
+    if event is None and event_log is not None:
+        event = event_log.get(event_id)
+    if event is None:
+        return jsonify({'error': 'Event not found'}), 404
+    return jsonify(event)
+
 @app.route('/api/events', methods=['GET'])
 def get_events():
-    """Get all events"""
+    """Get a page of events, newest first, filtered by type/since/until (304 when unchanged)"""
     try:
-        # Return events in reverse chronological order
-        return jsonify(sorted(events_db, key=lambda x: x['timestamp'], reverse=True))
+        try:
+            query = parse_event_query(request.args)
+        except PaginationError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        etag = repository.versions.etag('events')
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        
+        if not any(query[key] for key in ('type', 'since', 'until', 'cursor')) and query['limit'] <= repository.recent_events.capacity:
+            # Unfiltered first page: served straight from the recent-events index
+            events = repository.recent_events.latest(query['limit'])
+            next_cursor = None
+            if events and len(events_db) > len(events):
+                next_cursor = encode_cursor(events[-1]['timestamp'], events[-1]['id'])
+        else:
+            events, next_cursor = paginate_events(repository.events_of_type(query['type']) if query['type'] else events_db, query)
+        response = jsonify(events)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return tag_response(response, etag)
     except Exception as e:
         logger.error(f"Error fetching events: {e}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -218,6 +419,7 @@ def get_events():
 def handle_connect():
     """Handle client connection"""
     logger.info('🔌 Client connected via WebSocket')
+    event_broadcaster.client_connected(request.sid)
     emit('message', {
         'data': 'Connected to FinaTech Event System',
         'timestamp': datetime.now().isoformat(),
@@ -233,18 +435,63 @@ def handle_connect():
     })
     
     # Send recent events
-    recent_events = sorted(events_db, key=lambda x: x['timestamp'], reverse=True)[:5]
+    recent_events = repository.recent_events.latest(5)
     emit('recent_events', recent_events)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
     logger.info('🔌 Client disconnected from WebSocket')
+    event_broadcaster.client_disconnected(request.sid)
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Join event rooms, e.g. {'types': ['transaction_processed'], 'user_ids': [42]} or {'types': ['*']}"""
+    emit('subscriptions', {'rooms': event_broadcaster.subscribe(request.sid, data)})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """Leave event rooms"""
+    emit('subscriptions', {'rooms': event_broadcaster.unsubscribe(request.sid, data)})
+
+@socketio.on('events_ack')
+def handle_events_ack(data):
+    """Record the last events_batch frame a client has processed"""
+    event_broadcaster.ack(request.sid, (data or {}).get('seq'))
+
+@socketio.on('events_resume')
+def handle_events_resume():
+    """Rejoin live events after a resync_required notice"""
+    event_broadcaster.resume(request.sid)
+
+@socketio.on('resume')
+def handle_resume(data):
+    """Replay the events a reconnecting client missed after {'last_event_id': N}, then continue live"""
+    try:
+        last_event_id = int((data or {}).get('last_event_id'))
+    except (TypeError, ValueError):
+        emit('resync_required', {'reason': 'invalid_resume'})
+        return
+    if last_event_id > repository.last_event_id():
+        # The client saw ids this server never issued (e.g. a restart without an event log)
+        emit('resync_required', {'reason': 'unknown_position', 'last_event_id': last_event_id})
+        return
+    sid = request.sid
+    # Back in the rooms first: anything published from here on arrives live
+    event_broadcaster.resume(sid)
+    # Everything published before that has an id <= target; wait briefly for the consumer to store it
+    target = repository.last_event_id()
+    deadline = time.monotonic() + RESUME_STORE_WAIT
+    while repository.stored_event_id() < target and time.monotonic() < deadline:
+        socketio.sleep(0.01)
+    missed = repository.events_after(last_event_id, limit=event_broadcaster.resume_max_events + 1)
+    sent = event_broadcaster.replay(sid, last_event_id, missed)
+    logger.info(f"⏩ Client resumed after event {last_event_id}, replayed {sent} events")
 
 @socketio.on('get_events')
 def handle_get_events():
     """Handle request for events"""
-    recent_events = sorted(events_db, key=lambda x: x['timestamp'], reverse=True)[:10]
+    recent_events = repository.recent_events.latest(10)
     emit('events_update', recent_events)
 
 @socketio.on('get_users')
@@ -268,26 +515,37 @@ def handle_ping():
     emit('pong', {'timestamp': datetime.now().isoformat()})
 
 if __name__ == '__main__':
-    # Start event processor thread
-    event_thread = threading.Thread(target=event_processor, daemon=True)
-    event_thread.start()
-    
-    # Add some sample data
-    sample_user = {
-        'id': 1,
-        'name': 'John Doe',
-        'email': 'john.doe@example.com',
-        'created_at': datetime.now().isoformat()
-    }
-    users_db.append(sample_user)
-    
-    # Publish initial event
-    event_bus.publish('system_started', {
-        'message': 'FinaTech Event-Driven Architecture initialized',
-        'version': '1.0.0',
-        'features': ['Event Bus', 'WebSocket Support', 'Real-time Updates', 'Background Processing'],
-        'socketio_enabled': True
-    })
+    # debug=True runs this file twice: a reloader parent that only watches for code
+    # changes and a child (WERKZEUG_RUN_MAIN set) that serves. Only the child may own
+    # the event log and snapshots, run background work or publish system_started.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Restore state before accepting events; after the consumer drains, snapshot and close the log
+        if event_log is not None:
+            event_log.open()
+            restore_from_event_log()
+            atexit.register(event_log.close)
+            snapshotter.start()
+            atexit.register(snapshotter.stop)
+        
+        # Start event processor thread and drain it on shutdown
+        event_consumer.start()
+        atexit.register(event_consumer.stop)
+        if subscriber_dispatcher:
+            atexit.register(subscriber_dispatcher.shutdown)
+        event_broadcaster.start()
+        atexit.register(event_broadcaster.stop)
+        
+        # Add some sample data
+        if not users_db:
+            repository.add_user('John Doe', 'john.doe@example.com')
+        
+        # Publish initial event
+        event_bus.publish('system_started', {
+            'message': 'FinaTech Event-Driven Architecture initialized',
+            'version': '1.0.0',
+            'features': ['Event Bus', 'WebSocket Support', 'Real-time Updates', 'Background Processing'],
+            'socketio_enabled': True
+        })
     
     print("🚀 FinaTech Event-Driven Backend Starting...")
     print("📊 Backend running on: http://localhost:5001")
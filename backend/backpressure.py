@@ -0,0 +1,189 @@
+import queue
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('block', 'reject', 'shed')
+
+class BoundedEventQueue(queue.Queue):
+    """Bounded event queue with an overflow policy.
+
+    'block'  - write requests and publishers wait up to block_timeout for space
+    'reject' - write requests are refused with 503 and Retry-After while the queue is full
+    'shed'   - events of shed_types (listed lowest priority first) make room for
+               higher-priority ones: a queued lower-priority event is evicted, or
+               the incoming event is dropped if nothing queued ranks below it
+
+    Whatever the policy, an event that still finds no room after block_timeout
+    is dropped and counted, so memory stays bounded under sustained overload.
+    Write handlers reserve() room before changing anything, so a write is refused
+    rather than committed without its event.
+    """
+
+    def __init__(self, maxsize=10000, policy='block', block_timeout=1.0, shed_types=(), retry_after=1):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f'policy must be one of {OVERFLOW_POLICIES}')
+        super().__init__(maxsize)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.retry_after = retry_after
+        self._shed_rank = {event_type: rank for rank, event_type in enumerate(shed_types)}
+        self.high_water = 0
+        self._reserved = 0
+        self.stats = {'offered': 0, 'blocked': 0, 'shed': 0, 'dropped': 0, 'rejected_requests': 0}
+
+    def _put(self, item):
+        # Called with self.mutex held
+        super()._put(item)
+        if len(self.queue) > self.high_water:
+            self.high_water = len(self.queue)
+
+    def _rank(self, event):
+        """Shed priority: lower sheds first; events not in shed_types are never shed"""
+        if not isinstance(event, dict):
+            return len(self._shed_rank)
+        return self._shed_rank.get(event.get('type'), len(self._shed_rank))
+
+    def _count(self, stat):
+        with self.mutex:
+            self.stats[stat] += 1
+
+    def offer(self, event):
+        """Enqueue a published event according to the overflow policy; returns False if it was dropped"""
+        self._count('offered')
+        try:
+            self.put_nowait(event)
+            return True
+        except queue.Full:
+            pass
+
+        if self.policy == 'shed':
+            shed = self._shed(event)
+            if shed is not None:
+                return shed
+
+        started = time.monotonic()
+        try:
+            self.put(event, timeout=self.block_timeout)
+        except queue.Full:
+            self._count('dropped')
+            logger.error(f"Event queue full for {time.monotonic() - started:.1f}s, dropped {event['type']}")
+            return False
+        self._count('blocked')
+        return True
+
+    def _shed(self, event):
+        """Evict a lower-priority queued event or drop this one; None when neither applies"""
+        rank = self._rank(event)
+        with self.not_full:
+            if self._qsize() < self.maxsize:
+                self._put(event)
+                self.unfinished_tasks += 1
+                self.not_empty.notify()
+                return True
+            victim = self._victim(rank)
+            if victim is not None:
+                del self.queue[victim]
+                self._put(event)
+                self.stats['shed'] += 1
+                # The new event takes over the evicted one's unfinished-task count
+                self.not_empty.notify()
+                return True
+            if rank < len(self._shed_rank):
+                self.stats['shed'] += 1
+                return False
+        return None
+
+    def _victim(self, rank):
+        """Index of the lowest-ranked queued event below rank, or None; called with self.mutex held"""
+        victim = None
+        for index, queued in enumerate(self.queue):
+            queued_rank = self._rank(queued)
+            if queued_rank < rank and (victim is None or queued_rank < victim[1]):
+                victim = (index, queued_rank)
+                if queued_rank == 0:
+                    break
+        return victim[0] if victim is not None else None
+
+    def _has_room(self):
+        # Called with self.mutex held; reserved slots count as taken
+        return self.maxsize <= 0 or self._qsize() + self._reserved < self.maxsize
+
+    def reserve(self, event_type):
+        """Reserve room for one event before making the change it will describe.
+
+        The overflow policy is applied here instead of at put time: 'block' waits up
+        to block_timeout, 'reject' fails at once and 'shed' evicts a queued
+        lower-priority event before falling back to waiting. Returns a Reservation,
+        or None when there is no room and the write should be answered with 503.
+        """
+        rank = self._rank({'type': event_type})
+        with self.not_full:
+            if not self._has_room() and self.policy == 'shed':
+                victim = self._victim(rank)
+                if victim is not None:
+                    del self.queue[victim]
+                    self.unfinished_tasks -= 1
+                    self.stats['shed'] += 1
+            if not self._has_room():
+                if self.policy == 'reject' or not self.not_full.wait_for(self._has_room, self.block_timeout):
+                    self.stats['rejected_requests'] += 1
+                    return None
+                self.stats['blocked'] += 1
+            self._reserved += 1
+        return Reservation(self)
+
+    def _put_reserved(self, event):
+        with self.mutex:
+            self._reserved -= 1
+            self.stats['offered'] += 1
+            self._put(event)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _release(self):
+        with self.mutex:
+            self._reserved -= 1
+            self.not_full.notify()
+
+    def status(self):
+        """Queue gauges for health reporting"""
+        with self.mutex:
+            return {
+                'depth': self._qsize(),
+                'max_size': self.maxsize,
+                'reserved': self._reserved,
+                'high_water': self.high_water,
+                'policy': self.policy,
+                **self.stats
+            }
+
+
+class Reservation:
+    """Room for one event in a BoundedEventQueue, taken by reserve().
+
+    put() enqueues without waiting; leaving a with block without calling put()
+    hands the room back, e.g. when the write the event describes failed.
+    """
+
+    def __init__(self, event_queue):
+        self._queue = event_queue
+        self._held = True
+
+    def put(self, event):
+        if not self._held:
+            raise RuntimeError('Reservation has already been used')
+        self._held = False
+        self._queue._put_reserved(event)
+
+    def release(self):
+        if self._held:
+            self._held = False
+            self._queue._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
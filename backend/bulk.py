@@ -0,0 +1,94 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+import json_codec
+
+BULK_BATCH_SIZE = 1000
+MAX_BULK_ROWS = 500000
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Transactions.amount is DECIMAL(10,2)
+MAX_AMOUNT = Decimal('99999999.99')
+
+class BulkPayloadError(ValueError):
+    """Raised when a bulk request body cannot be parsed at all"""
+
+def parse_bulk_body(request):
+    """Read a bulk body as a JSON array or NDJSON into a list of (index, row) pairs.
+
+    Lines of an NDJSON body that are not valid JSON are returned as
+    (index, None) so they can be reported per row instead of failing the batch.
+    """
+    if request.mimetype == NDJSON_MIMETYPE:
+        rows = []
+        for index, line in enumerate(request.stream):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append((index, json_codec.loads(line)))
+            except ValueError:
+                rows.append((index, None))
+            if len(rows) > MAX_BULK_ROWS:
+                raise BulkPayloadError(f'At most {MAX_BULK_ROWS} rows per request')
+        return rows
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        raise BulkPayloadError('Body must be a JSON array or NDJSON (application/x-ndjson)')
+    if len(data) > MAX_BULK_ROWS:
+        raise BulkPayloadError(f'At most {MAX_BULK_ROWS} rows per request')
+    return list(enumerate(data))
+
+def chunked(items, size=BULK_BATCH_SIZE):
+    """Split a list into consecutive slices of at most size items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def parse_amount(value):
+    """Amount as a Decimal rounded to cents; raises ValueError if it is not a number or out of range"""
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ValueError('amount must be a number') from None
+    # Checked before rounding (quantize fails on huge values); anything that rounds up past MAX_AMOUNT is out too
+    if not amount.is_finite() or abs(amount) >= MAX_AMOUNT + Decimal('0.005'):
+        raise ValueError('amount is out of range')
+    return amount.quantize(Decimal('0.01'), ROUND_HALF_UP)
+
+def validate_transaction(row):
+    """Return (clean_row, None) for a valid transaction or (None, error message)"""
+    if not isinstance(row, dict):
+        return None, 'Row must be a JSON object'
+    if not all(field in row for field in ('user_id', 'amount', 'type')):
+        return None, 'user_id, amount, and type are required'
+    try:
+        user_id = int(row['user_id'])
+    except (TypeError, ValueError):
+        return None, 'user_id must be an integer'
+    try:
+        amount = parse_amount(row['amount'])
+    except ValueError as e:
+        return None, str(e)
+    transaction_type = row['type']
+    if not isinstance(transaction_type, str) or not transaction_type or len(transaction_type) > 50:
+        return None, 'type must be a non-empty string of at most 50 characters'
+    return {'user_id': user_id, 'amount': amount, 'type': transaction_type}, None
+
+def validate_user(row):
+    """Return (clean_row, None) for a valid user or (None, error message)"""
+    if not isinstance(row, dict):
+        return None, 'Row must be a JSON object'
+    name, email = row.get('name'), row.get('email')
+    if not name or not email:
+        return None, 'Name and email are required'
+    if not isinstance(name, str) or len(name) > 100:
+        return None, 'name must be a string of at most 100 characters'
+    if not isinstance(email, str) or len(email) > 255 or '@' not in email:
+        return None, 'email must be a valid address of at most 255 characters'
+    return {'name': name.strip(), 'email': email.strip()}, None
+
+def bulk_status(inserted, errors):
+    """HTTP status for a bulk result: 201 all rows, 207 partial, 400 nothing inserted"""
+    if not errors:
+        return 201
+    return 207 if inserted else 400
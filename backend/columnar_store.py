@@ -0,0 +1,230 @@
+import threading
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; aggregations fall back to pure Python
+    np = None
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+def to_cents(amount):
+    """Convert a money amount (int, float, str or Decimal) to integer cents"""
+    cents = Decimal(str(amount)) * 100
+    if not cents.is_finite():
+        raise ValueError(f'amount {amount!r} is not a finite number')
+    return int(cents.to_integral_value(ROUND_HALF_UP))
+
+class ColumnarTransactionStore:
+    """Array-backed transaction table holding one typed column per field.
+
+    Each row costs about 34 bytes (int64 id, user_id, amount in cents and
+    created_at in epoch microseconds, plus a uint16 interned type code)
+    instead of a dict per transaction. Rows are materialized as dicts only
+    when they leave through the API; aggregations run over whole columns,
+    vectorized with NumPy when it is installed.
+    """
+
+    def __init__(self):
+        self.ids = array('q')
+        self.user_ids = array('q')
+        self.amount_cents = array('q')
+        self.created_at_us = array('q')
+        self.type_codes = array('H')
+        self.type_names = []
+        self._type_index = {}
+        self._rows_by_user = {}
+        self._run_ids = array('q')
+        self._run_rows = array('q')
+        self._unordered_rows = {}
+        self._max_id = 0
+        self._last_id = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _type_code(self, transaction_type):
+        if not isinstance(transaction_type, str):
+            raise ValueError('transaction type must be a string')
+        code = self._type_index.get(transaction_type)
+        if code is None:
+            code = len(self.type_names)
+            if code > 0xFFFF:
+                raise ValueError('Too many distinct transaction types')
+            self.type_names.append(transaction_type)
+            self._type_index[transaction_type] = code
+        return code
+
+    def append(self, user_id, amount, transaction_type, created_at=None, transaction_id=None):
+        """Add a transaction (with the next id unless one is given) and return its row view"""
+        created = created_at or datetime.now()
+        if isinstance(created, str):
+            created = datetime.fromisoformat(created)
+        cents = to_cents(amount)
+        created_us = int(created.timestamp() * 1_000_000)
+        with self._lock:
+            row = len(self.ids)
+            if transaction_id is None:
+                transaction_id = self._next_id
+            # Everything is computed and checked before the first append, so a
+            # bad value can never leave the columns at different lengths
+            if not all(INT64_MIN <= value <= INT64_MAX for value in (transaction_id, user_id, cents, created_us)):
+                raise ValueError('transaction value out of range for the columnar store')
+            if transaction_id <= self._max_id and self._find_row(transaction_id) is not None:
+                raise ValueError(f'transaction {transaction_id} already exists')
+            type_code = self._type_code(transaction_type)
+            self._index_id(transaction_id, row)
+            self._next_id = max(self._next_id, transaction_id + 1)
+            self.ids.append(transaction_id)
+            self.user_ids.append(user_id)
+            self.amount_cents.append(cents)
+            self.created_at_us.append(created_us)
+            self.type_codes.append(type_code)
+            self._rows_by_user.setdefault(user_id, array('q')).append(row)
+        return self.row(row)
+
+    def _index_id(self, transaction_id, row):
+        """Record where transaction_id lives (lock held, called before its row is appended).
+
+        Ids normally ascend, so rows form runs of consecutive ids and only the
+        first id and row of each run is stored: a restored history with gaps
+        costs 16 bytes per gap, not per row. The rare id below the highest
+        seen so far goes to a dict.
+        """
+        if transaction_id <= self._max_id:
+            self._unordered_rows[transaction_id] = row
+            self._last_id = transaction_id
+            return
+        if not (self._run_ids and self._last_id == self._max_id and transaction_id == self._max_id + 1):
+            self._run_ids.append(transaction_id)
+            self._run_rows.append(row)
+        self._max_id = transaction_id
+        self._last_id = transaction_id
+
+    def _find_row(self, transaction_id):
+        """Row index for an id, or None"""
+        run = bisect_right(self._run_ids, transaction_id) - 1
+        if run >= 0:
+            row = self._run_rows[run] + transaction_id - self._run_ids[run]
+            if row < len(self.ids) and self.ids[row] == transaction_id:
+                return row
+        return self._unordered_rows.get(transaction_id)
+
+    def row(self, index):
+        """Materialize one row as the API's transaction dict"""
+        return {
+            'id': self.ids[index],
+            'user_id': self.user_ids[index],
+            'amount': self.amount_cents[index] / 100,
+            'type': self.type_names[self.type_codes[index]],
+            'created_at': datetime.fromtimestamp(self.created_at_us[index] / 1_000_000).isoformat()
+        }
+
+    def get(self, transaction_id):
+        """Row view for an id, or None"""
+        index = self._find_row(transaction_id)
+        return self.row(index) if index is not None else None
+
+    def for_user(self, user_id):
+        """A user's transactions as row views, oldest first"""
+        return [self.row(index) for index in self._rows_by_user.get(user_id, ())]
+
+    def __iter__(self):
+        for index in range(len(self.ids)):
+            yield self.row(index)
+
+    def export_columns(self):
+        """Point-in-time copy of the columns and type table"""
+        with self._lock:
+            return {
+                'ids': array('q', self.ids),
+                'user_ids': array('q', self.user_ids),
+                'amount_cents': array('q', self.amount_cents),
+                'created_at_us': array('q', self.created_at_us),
+                'type_codes': array('H', self.type_codes),
+                'type_names': list(self.type_names)
+            }
+
+    def load_columns(self, columns):
+        """Replace the contents with columns from export_columns() and rebuild the indexes"""
+        with self._lock:
+            for name in ('ids', 'user_ids', 'amount_cents', 'created_at_us', 'type_codes'):
+                column = getattr(self, name)
+                del column[:]
+                column.extend(columns[name])
+            self.type_names[:] = columns['type_names']
+            self._type_index = {name: code for code, name in enumerate(self.type_names)}
+            self._rows_by_user = {}
+            self._run_ids = array('q')
+            self._run_rows = array('q')
+            self._unordered_rows = {}
+            self._max_id = self._last_id = 0
+            for row, (transaction_id, user_id) in enumerate(zip(self.ids, self.user_ids)):
+                self._index_id(transaction_id, row)
+                self._rows_by_user.setdefault(user_id, array('q')).append(row)
+            self._next_id = max(self.ids, default=0) + 1
+
+    def summary(self, user_id=None, transaction_type=None):
+        """Count, total, min, max and per-type totals, optionally for one user and/or type"""
+        with self._lock:
+            if user_id is not None:
+                rows = self._rows_by_user.get(user_id, array('q'))
+            else:
+                rows = None
+            code = self._type_index.get(transaction_type) if transaction_type is not None else None
+            if transaction_type is not None and code is None:
+                return self._format_summary(0, 0, None, None, {})
+            if np is not None:
+                return self._summary_numpy(rows, code)
+            return self._summary_python(rows, code)
+
+    def _summary_numpy(self, rows, code):
+        amounts = np.frombuffer(self.amount_cents, dtype=np.int64)
+        codes = np.frombuffer(self.type_codes, dtype=np.uint16)
+        if rows is not None:
+            selected = np.frombuffer(rows, dtype=np.int64)
+            amounts, codes = amounts[selected], codes[selected]
+        if code is not None:
+            mask = codes == code
+            amounts, codes = amounts[mask], codes[mask]
+        if not len(amounts):
+            return self._format_summary(0, 0, None, None, {})
+        counts = np.bincount(codes, minlength=len(self.type_names))
+        totals = np.bincount(codes, weights=amounts, minlength=len(self.type_names))
+        by_type = {self.type_names[c]: (int(counts[c]), int(totals[c])) for c in np.flatnonzero(counts)}
+        return self._format_summary(len(amounts), int(amounts.sum()), int(amounts.min()), int(amounts.max()), by_type)
+
+    def _summary_python(self, rows, code):
+        indices = rows if rows is not None else range(len(self.ids))
+        count = total = 0
+        low = high = None
+        by_type = {}
+        for index in indices:
+            row_code = self.type_codes[index]
+            if code is not None and row_code != code:
+                continue
+            cents = self.amount_cents[index]
+            count += 1
+            total += cents
+            low = cents if low is None else min(low, cents)
+            high = cents if high is None else max(high, cents)
+            name = self.type_names[row_code]
+            type_count, type_total = by_type.get(name, (0, 0))
+            by_type[name] = (type_count + 1, type_total + cents)
+        return self._format_summary(count, total, low, high, by_type)
+
+    @staticmethod
+    def _format_summary(count, total, low, high, by_type):
+        return {
+            'count': count,
+            'total': total / 100,
+            'average': round(total / count / 100, 2) if count else None,
+            'min': low / 100 if low is not None else None,
+            'max': high / 100 if high is not None else None,
+            'by_type': {name: {'count': n, 'total': cents / 100} for name, (n, cents) in by_type.items()}
+        }
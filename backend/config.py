@@ -1,5 +1,5 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 @dataclass
 class DatabaseConfig:
@@ -9,11 +9,85 @@ class DatabaseConfig:
     username: str = os.getenv('DB_USERNAME', 'sa')
     password: str = os.getenv('DB_PASSWORD', 'your_password')
     driver: str = os.getenv('DB_DRIVER', '{ODBC Driver 17 for SQL Server}')
-    
+
+    # Connection pool settings
+    pool_min_size: int = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+    pool_max_size: int = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+    pool_timeout: float = float(os.getenv('DB_POOL_TIMEOUT', 5))
+    pool_recycle: float = float(os.getenv('DB_POOL_RECYCLE', 1800))
+    pool_idle_timeout: float = float(os.getenv('DB_POOL_IDLE_TIMEOUT', 300))
+    pool_health_check_interval: float = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+
     @property
     def connection_string(self) -> str:
         return f"DRIVER={self.driver};SERVER={self.server};DATABASE={self.database};UID={self.username};PWD={self.password}"
 
+@dataclass
+class EventProcessorConfig:
+    """Background event processor settings"""
+    batch_size: int = int(os.getenv('EVENT_BATCH_SIZE', 500))
+    batch_max_wait_ms: float = float(os.getenv('EVENT_BATCH_MAX_WAIT_MS', 50))
+
+@dataclass
+class EventQueueConfig:
+    """In-process event queue bound and overflow policy (block, reject or shed)"""
+    max_size: int = int(os.getenv('EVENT_QUEUE_MAX_SIZE', 10000))
+    overflow: str = os.getenv('EVENT_QUEUE_OVERFLOW', 'block')
+    block_timeout: float = float(os.getenv('EVENT_QUEUE_BLOCK_TIMEOUT', 1))
+    retry_after: int = int(os.getenv('EVENT_QUEUE_RETRY_AFTER', 1))
+    # Event types that may be shed, lowest priority first
+    shed_types: list = field(default_factory=lambda: [t for t in os.getenv('EVENT_QUEUE_SHED_TYPES', 'system_started').split(',') if t])
+
+@dataclass
+class OutboxConfig:
+    """Events outbox processing (EVENT_OUTBOX_WORKERS=0 leaves it to external worker processes)"""
+    workers: int = int(os.getenv('EVENT_OUTBOX_WORKERS', 1))
+    batch_size: int = int(os.getenv('EVENT_OUTBOX_BATCH_SIZE', 100))
+    poll_interval_ms: float = float(os.getenv('EVENT_OUTBOX_POLL_MS', 200))
+
+@dataclass
+class WorkerPoolConfig:
+    """Standalone event worker processes (event_worker.py)"""
+    processes: int = int(os.getenv('EVENT_WORKER_PROCESSES', os.cpu_count() or 1))
+    partition_by: str = os.getenv('EVENT_WORKER_PARTITION_BY', 'user_id')
+    report_interval: float = float(os.getenv('EVENT_WORKER_REPORT_INTERVAL', 10))
+
+@dataclass
+class SubscriberDispatchConfig:
+    """Event subscriber dispatch settings ('inline' runs callbacks on the publishing thread)"""
+    mode: str = os.getenv('EVENT_DISPATCH_MODE', 'async')
+    workers: int = int(os.getenv('EVENT_DISPATCH_WORKERS', 4))
+    max_pending: int = int(os.getenv('EVENT_DISPATCH_MAX_PENDING', 10000))
+    per_subscriber_limit: int = int(os.getenv('EVENT_DISPATCH_PER_SUBSCRIBER_LIMIT', 1))
+    timeout: float = float(os.getenv('EVENT_DISPATCH_TIMEOUT', 5))
+
+@dataclass
+class BroadcastConfig:
+    """Socket.IO event broadcast settings"""
+    window_ms: float = float(os.getenv('EVENT_EMIT_WINDOW_MS', 50))
+    max_batch_size: int = int(os.getenv('EVENT_EMIT_MAX_BATCH_SIZE', 500))
+    max_client_lag: int = int(os.getenv('EVENT_EMIT_MAX_CLIENT_LAG', 20))
+    resume_chunk_size: int = int(os.getenv('EVENT_RESUME_CHUNK_SIZE', 500))
+    resume_max_events: int = int(os.getenv('EVENT_RESUME_MAX_EVENTS', 10000))
+
+@dataclass
+class ReadCacheConfig:
+    """Read-through cache for the user listing (USER_CACHE_TTL=0 disables it)"""
+    user_max_entries: int = int(os.getenv('USER_CACHE_MAX_ENTRIES', 256))
+    user_ttl: float = float(os.getenv('USER_CACHE_TTL', 30))
+
+@dataclass
+class StorageConfig:
+    """Local durable storage for the in-memory backend (disabled when EVENT_LOG_DIR is empty)"""
+    event_log_dir: str = os.getenv('EVENT_LOG_DIR', '')
+    segment_bytes: int = int(os.getenv('EVENT_LOG_SEGMENT_BYTES', 64 * 1024 * 1024))
+    fsync: str = os.getenv('EVENT_LOG_FSYNC', 'interval')
+    fsync_interval: float = float(os.getenv('EVENT_LOG_FSYNC_INTERVAL', 1))
+    snapshot_dir: str = os.getenv('SNAPSHOT_DIR', '')
+    snapshot_interval: float = float(os.getenv('SNAPSHOT_INTERVAL', 300))
+    snapshot_min_events: int = int(os.getenv('SNAPSHOT_MIN_EVENTS', 1000))
+    snapshot_retain: int = int(os.getenv('SNAPSHOT_RETAIN', 2))
+
 @dataclass
 class AppConfig:
     """Application configuration settings"""
@@ -21,8 +95,18 @@ class AppConfig:
     debug: bool = os.getenv('DEBUG', 'True').lower() == 'true'
     host: str = os.getenv('HOST', '0.0.0.0')
     port: int = int(os.getenv('PORT', 5000))
-    cors_origins: list = ["http://localhost:3000"]
+    cors_origins: list = field(default_factory=lambda: os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(','))
+    socketio_message_queue: str = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+    json_codec: str = os.getenv('JSON_CODEC', 'auto')
 
 # Global configuration instances
 db_config = DatabaseConfig()
-app_config = AppConfig()
\ No newline at end of file
+event_config = EventProcessorConfig()
+queue_config = EventQueueConfig()
+outbox_config = OutboxConfig()
+worker_config = WorkerPoolConfig()
+dispatch_config = SubscriberDispatchConfig()
+broadcast_config = BroadcastConfig()
+cache_config = ReadCacheConfig()
+storage_config = StorageConfig()
+app_config = AppConfig()
@@ -46,7 +46,7 @@ BEGIN
         event_type NVARCHAR(100) NOT NULL,
         event_data NVARCHAR(MAX),
         timestamp DATETIME2 DEFAULT GETDATE(),
-        processed BIT DEFAULT 0
+        processed BIT NOT NULL DEFAULT 0
     );
 END
 GO
@@ -70,6 +70,23 @@ BEGIN
 END
 GO
 
+-- Supports unfiltered keyset pagination of GET /api/events (newest first)
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Events_Timestamp')
+BEGIN
+    CREATE INDEX IX_Events_Timestamp ON Events(timestamp);
+END
+GO
+
+-- Outbox: workers claim rows WHERE processed = 0; the filtered index keeps that
+-- claim a seek over the (small) unprocessed backlog instead of the whole table
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Events_Unprocessed')
+BEGIN
+    -- Events stored before the outbox existed were already delivered in-process
+    UPDATE Events SET processed = 1 WHERE processed = 0 OR processed IS NULL;
+    CREATE INDEX IX_Events_Unprocessed ON Events(id) WHERE processed = 0;
+END
+GO
+
 -- Insert sample data
 IF NOT EXISTS (SELECT * FROM Users)
 BEGIN
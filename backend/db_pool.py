@@ -0,0 +1,250 @@
+import threading
+import time
+import logging
+from collections import deque
+
+import pyodbc
+
+from metrics import DB_ACQUIRE_SECONDS, DB_CONNECT_SECONDS, DB_QUERY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available before the checkout timeout"""
+
+class TimedCursor:
+    """Proxy around a pyodbc cursor that records statement execution time"""
+
+    __slots__ = ('_raw',)
+
+    def __init__(self, raw):
+        object.__setattr__(self, '_raw', raw)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        # e.g. fast_executemany
+        setattr(self._raw, name, value)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def execute(self, sql, *params):
+        with DB_QUERY_SECONDS.time('execute'):
+            self._raw.execute(sql, *params)
+        return self
+
+    def executemany(self, sql, params):
+        with DB_QUERY_SECONDS.time('executemany'):
+            self._raw.executemany(sql, params)
+        return self
+
+class PoolSlot:
+    """A pooled pyodbc connection and its age; owned by the pool while idle"""
+
+    __slots__ = ('raw', 'created_at', 'last_used')
+
+    def __init__(self, raw, created_at):
+        self.raw = raw
+        self.created_at = created_at
+        self.last_used = created_at
+
+class PooledConnection:
+    """One checkout of a pooled pyodbc connection; close() returns it to the pool.
+
+    Every acquire() hands out a new wrapper and release detaches it, so closing
+    twice is a no-op and a closed wrapper can never reach a connection that
+    has since been checked out by someone else.
+    """
+
+    def __init__(self, pool, slot):
+        self._pool = pool
+        self._slot = slot
+
+    def _connection(self):
+        slot = self._slot
+        if slot is None:
+            raise pyodbc.ProgrammingError('Attempt to use a connection that was returned to the pool')
+        return slot.raw
+
+    def __getattr__(self, name):
+        return getattr(self._connection(), name)
+
+    def cursor(self):
+        """Cursor whose statements are timed into the query latency histogram"""
+        return TimedCursor(self._connection().cursor())
+
+    def close(self):
+        """Return the connection to the pool instead of closing it"""
+        self._pool.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Unlike pyodbc's own context manager this never commits implicitly;
+        # callers commit explicitly and anything left over is rolled back
+        self.close()
+        return False
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of pyodbc connections"""
+
+    def __init__(self, config):
+        self.config = config
+        self._idle = deque()
+        self._size = 0
+        self._lock = threading.Condition(threading.Lock())
+        self._closed = False
+        self.stats = {'created': 0, 'recycled': 0, 'failed_health_checks': 0, 'timeouts': 0}
+
+    def _connect(self):
+        with DB_CONNECT_SECONDS.time():
+            raw = pyodbc.connect(self.config.connection_string)
+        with self._lock:
+            self.stats['created'] += 1
+        return PoolSlot(raw, time.monotonic())
+
+    def fill(self):
+        """Open connections until the pool holds at least pool_min_size"""
+        while True:
+            with self._lock:
+                if self._closed or self._size >= self.config.pool_min_size:
+                    return
+                self._size += 1
+            try:
+                slot = self._connect()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                    self._lock.notify()
+                raise
+            with self._lock:
+                self._idle.append(slot)
+                self._lock.notify()
+
+    def _is_stale(self, slot, now):
+        if now - slot.created_at > self.config.pool_recycle:
+            return True
+        return now - slot.last_used > self.config.pool_idle_timeout and self._size > self.config.pool_min_size
+
+    def _is_healthy(self, slot, now):
+        if now - slot.last_used < self.config.pool_health_check_interval:
+            return True
+        try:
+            cursor = slot.raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception as e:
+            with self._lock:
+                self.stats['failed_health_checks'] += 1
+            logger.warning(f"Discarding unhealthy pooled connection: {e}")
+            return False
+
+    def _discard(self, slot):
+        try:
+            slot.raw.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._lock.notify()
+
+    def acquire(self):
+        """Check out a connection, waiting up to pool_timeout when exhausted"""
+        with DB_ACQUIRE_SECONDS.time():
+            return self._acquire()
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.config.pool_timeout
+        while True:
+            slot = None
+            with self._lock:
+                while not self._idle and self._size >= self.config.pool_max_size:
+                    if self._closed:
+                        raise PoolTimeout('Connection pool is closed')
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout(f"No database connection available after {self.config.pool_timeout}s")
+                    self._lock.wait(remaining)
+                if self._closed:
+                    raise PoolTimeout('Connection pool is closed')
+                if self._idle:
+                    # LIFO keeps the hot connections in use and lets the rest go idle
+                    slot = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if slot is None:
+                try:
+                    slot = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+                slot.last_used = time.monotonic()
+                return PooledConnection(self, slot)
+
+            now = time.monotonic()
+            if self._is_stale(slot, now):
+                with self._lock:
+                    self.stats['recycled'] += 1
+                self._discard(slot)
+                continue
+            if not self._is_healthy(slot, now):
+                self._discard(slot)
+                continue
+            slot.last_used = now
+            return PooledConnection(self, slot)
+
+    def release(self, conn):
+        """Return a checked-out connection to the pool, rolling back any open transaction.
+
+        Detaches conn first, so releasing the same checkout twice does nothing.
+        """
+        with self._lock:
+            slot, conn._slot = conn._slot, None
+        if slot is None:
+            return
+        try:
+            slot.raw.rollback()
+        except Exception as e:
+            logger.warning(f"Discarding pooled connection that failed to reset: {e}")
+            self._discard(slot)
+            return
+        slot.last_used = time.monotonic()
+        with self._lock:
+            if self._closed:
+                closing = True
+            else:
+                closing = False
+                self._idle.append(slot)
+                self._lock.notify()
+        if closing:
+            self._discard(slot)
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._lock.notify_all()
+        for slot in idle:
+            self._discard(slot)
+
+    def status(self):
+        """Snapshot of pool occupancy for health reporting"""
+        with self._lock:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.config.pool_max_size,
+                **self.stats
+            }
@@ -0,0 +1,38 @@
+import threading
+import uuid
+
+# Part of every tag, so a tag handed out before a restart never matches afterwards
+BOOT_ID = uuid.uuid4().hex[:12]
+
+class CollectionVersions:
+    """Change counters per collection, bumped by writers so readers can tag responses without reading data.
+
+    Writers bump after their change is visible (committed) and readers take
+    the tag before reading. A response can then carry an older tag than its
+    data, which only costs one extra full response, but never a newer one,
+    which would hide a change behind a 304.
+    """
+
+    def __init__(self, *names):
+        self._versions = dict.fromkeys(names, 0)
+        self._lock = threading.Lock()
+
+    def bump(self, name):
+        with self._lock:
+            self._versions[name] += 1
+
+    def etag(self, name):
+        """Opaque tag for the collection's current contents"""
+        return f'{BOOT_ID}-{name}-{self._versions[name]}'
+
+def not_modified(request, etag):
+    """304 response if the client's If-None-Match already names etag, else None"""
+    if request.if_none_match.contains_weak(etag):
+        return '', 304, {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+    return None
+
+def tag_response(response, etag):
+    """Attach etag; no-cache makes browsers revalidate on every poll instead of reusing the copy"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
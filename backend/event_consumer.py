@@ -0,0 +1,117 @@
+import threading
+import time
+import queue
+import logging
+from datetime import datetime
+
+from metrics import EVENT_BATCH_SECONDS, EVENT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Marker placed on the queue to wake the consumer up for shutdown
+_STOP = object()
+
+class EventConsumer:
+    """Background consumer that blocks on the event queue and hands events to a handler in batches"""
+
+    def __init__(self, event_queue, handler, batch_size=1, max_wait=0.0, name='event-processor'):
+        self.event_queue = event_queue
+        self.handler = handler
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self.name = name
+        self._thread = None
+        self._abort = False
+        self._in_flight = None
+        self.stats = {'batches': 0, 'events': 0, 'errors': 0}
+
+    def start(self):
+        """Start the consumer thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._abort = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, drain=True, timeout=10.0):
+        """Stop the consumer; with drain=True everything queued before the call is processed first"""
+        if not self._thread or not self._thread.is_alive():
+            return
+        self._abort = not drain
+        self.event_queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"{self.name} did not stop within {timeout}s")
+
+    def _collect(self):
+        """Block until an event arrives, then drain up to batch_size within max_wait"""
+        first = self.event_queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    event = self.event_queue.get(timeout=remaining)
+                else:
+                    event = self.event_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is _STOP:
+                return batch, True
+            batch.append(event)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect()
+            if batch and not self._abort:
+                self._in_flight = batch[0]
+                try:
+                    started = time.perf_counter()
+                    self.handler(batch)
+                    EVENT_BATCH_SECONDS.observe(time.perf_counter() - started, self.name)
+                    EVENT_BATCH_SIZE.observe(len(batch), self.name)
+                    self.stats['batches'] += 1
+                    self.stats['events'] += len(batch)
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    logger.error(f"Error processing event: {e}")
+                finally:
+                    self._in_flight = None
+            for _ in range(len(batch) + (1 if stopping else 0)):
+                self.event_queue.task_done()
+        logger.info(f"{self.name} stopped")
+
+    def _oldest_pending(self):
+        oldest = self._in_flight
+        if oldest is None:
+            with self.event_queue.mutex:
+                for item in self.event_queue.queue:
+                    if item is not _STOP:
+                        oldest = item
+                        break
+        return oldest
+
+    def lag(self):
+        """Age in seconds of the oldest event that has not been processed yet"""
+        oldest = self._oldest_pending()
+        if oldest is None:
+            return 0.0
+        try:
+            published = datetime.fromisoformat(oldest['timestamp'])
+        except (KeyError, TypeError, ValueError):
+            return 0.0
+        return max(0.0, (datetime.now() - published).total_seconds())
+
+    def status(self):
+        """Consumer state for health reporting"""
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'pending': self.event_queue.qsize(),
+            'lag_seconds': round(self.lag(), 3),
+            **self.stats
+        }
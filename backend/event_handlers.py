@@ -0,0 +1,17 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+def handle_user_created(event):
+    """Handle user created event"""
+    logger.info(f"User created: {event['data']}")
+
+def handle_transaction_processed(event):
+    """Handle transaction processed event"""
+    logger.info(f"Transaction processed: {event['data']}")
+
+# Subscribers shared by the web process (app.py) and the worker pool (event_worker.py)
+SUBSCRIBERS = {
+    'user_created': [handle_user_created],
+    'transaction_processed': [handle_transaction_processed]
+}
@@ -0,0 +1,252 @@
+import os
+import mmap
+import struct
+import threading
+import time
+import zlib
+import logging
+
+import json_codec
+
+try:
+    import fcntl
+except ImportError:  # Windows: msvcrt locks the first byte of the lock file instead
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# Record layout: payload length, event id, CRC32 of the payload, then the JSON payload
+RECORD_HEADER = struct.Struct('<IQI')
+SEGMENT_PREFIX = 'events-'
+SEGMENT_SUFFIX = '.log'
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+# Held exclusively by the one process that owns a log directory
+LOCK_NAME = 'LOCK'
+
+class EventLogLockedError(RuntimeError):
+    """Raised when another process already has the log directory open"""
+
+def lock_directory(directory):
+    """Take the directory's exclusive lock without waiting; returns the open lock file"""
+    lock_file = open(os.path.join(directory, LOCK_NAME), 'a+')
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.seek(0)
+        holder = lock_file.read().strip() or 'unknown'
+        lock_file.close()
+        raise EventLogLockedError(f'{directory} is in use by another process (pid {holder})') from None
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
+
+def _segment_name(number):
+    return f'{SEGMENT_PREFIX}{number:08d}{SEGMENT_SUFFIX}'
+
+class EventLog:
+    """Append-only, segmented event log on local disk.
+
+    Records are length-prefixed and checksummed; a torn record at the tail of
+    the newest segment (crash mid-write) is truncated on open. Segments roll
+    over at segment_size bytes and are read through read-only memory maps,
+    both for sequential replay and for random access by event id.
+
+    fsync policy: 'always' syncs every append, 'interval' at most once per
+    fsync_interval seconds, 'never' leaves flushing to the OS.
+
+    open() locks the directory, so a second process (say a debug reloader
+    parent) fails with EventLogLockedError instead of interleaving appends.
+    """
+
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, fsync='interval', fsync_interval=1.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f'fsync must be one of {FSYNC_POLICIES}')
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._segments = []
+        self._index = {}
+        self._maps = {}
+        self._file = None
+        self._dir_lock = None
+        self._last_sync = 0.0
+        self._lock = threading.RLock()
+        self.stats = {'appended': 0, 'bytes': 0, 'fsyncs': 0, 'truncated_bytes': 0}
+
+    def open(self):
+        """Scan existing segments, rebuild the id index and open the newest segment for appends"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._dir_lock = lock_directory(self.directory)
+        names = sorted(n for n in os.listdir(self.directory)
+                       if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX))
+        self._segments = [int(n[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) for n in names]
+        for number in self._segments:
+            valid_end = self._scan_segment(number)
+            path = self._path(number)
+            size = os.path.getsize(path)
+            if valid_end < size:
+                # Only the newest segment can legitimately end in a torn write
+                logger.warning(f"Truncating {size - valid_end} bytes of incomplete records from {path}")
+                stale = self._maps.pop(number, None)
+                if stale is not None:
+                    stale.close()
+                with open(path, 'r+b') as f:
+                    f.truncate(valid_end)
+                self.stats['truncated_bytes'] += size - valid_end
+        if not self._segments:
+            self._segments.append(1)
+        self._file = open(self._path(self._segments[-1]), 'ab')
+        return self
+
+    def _path(self, number):
+        return os.path.join(self.directory, _segment_name(number))
+
+    def _scan_segment(self, number):
+        """Index every intact record of a segment; returns the offset after the last one"""
+        data = self._map(number)
+        if data is None:
+            return 0
+        offset = 0
+        end = len(data)
+        while offset + RECORD_HEADER.size <= end:
+            length, event_id, crc = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            if start + length > end or zlib.crc32(data[start:start + length]) != crc:
+                break
+            self._index[event_id] = (number, offset)
+            offset = start + length
+        return offset
+
+    def _map(self, number):
+        """Read-only memory map of a segment, remapped when the active segment has grown"""
+        path = self._path(number)
+        size = os.path.getsize(path)
+        cached = self._maps.get(number)
+        if cached is not None and len(cached) == size:
+            return cached
+        if cached is not None:
+            # Readers may still hold the old map; it is released once they drop it
+            del self._maps[number]
+        if size == 0:
+            return None
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[number] = data
+        return data
+
+    def append(self, event):
+        """Append one event"""
+        self.append_many([event])
+
+    def append_many(self, events):
+        """Append events as consecutive records, syncing according to the fsync policy"""
+        with self._lock:
+            for event in events:
+                payload = json_codec.dumpb(event)
+                if self._file.tell() and self._file.tell() + RECORD_HEADER.size + len(payload) > self.segment_size:
+                    self._roll()
+                offset = self._file.tell()
+                self._file.write(RECORD_HEADER.pack(len(payload), event['id'], zlib.crc32(payload)))
+                self._file.write(payload)
+                self._index[event['id']] = (self._segments[-1], offset)
+                self.stats['appended'] += 1
+                self.stats['bytes'] += RECORD_HEADER.size + len(payload)
+            self._file.flush()
+            self._sync()
+
+    def _sync(self, force=False):
+        if self.fsync == 'never' and not force:
+            return
+        now = time.monotonic()
+        if force or self.fsync == 'always' or now - self._last_sync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+            self.stats['fsyncs'] += 1
+
+    def _roll(self):
+        self._file.flush()
+        self._sync(force=True)
+        self._file.close()
+        self._segments.append(self._segments[-1] + 1)
+        self._file = open(self._path(self._segments[-1]), 'ab')
+
+    def _read(self, number, offset):
+        data = self._map(number)
+        length, event_id, _ = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        return json_codec.loads(data[start:start + length]), start + length
+
+    def get(self, event_id):
+        """Random access to one event by id, or None"""
+        with self._lock:
+            location = self._index.get(event_id)
+            if location is None:
+                return None
+            self._file.flush()
+            return self._read(*location)[0]
+
+    @property
+    def is_open(self):
+        """Whether this process has the log open (and so holds its directory lock)"""
+        return self._file is not None
+
+    def position(self):
+        """(segment, offset) just past the last appended record"""
+        with self._lock:
+            self._file.flush()
+            return (self._segments[-1], self._file.tell())
+
+    def replay(self, start=None):
+        """Yield events in log order, from the beginning or from a position()"""
+        start_segment, start_offset = start or (0, 0)
+        with self._lock:
+            self._file.flush()
+            segments = [n for n in self._segments if n >= start_segment]
+        for number in segments:
+            with self._lock:
+                data = self._map(number)
+            if data is None:
+                continue
+            offset = start_offset if number == start_segment else 0
+            end = len(data)
+            while offset + RECORD_HEADER.size <= end:
+                length = RECORD_HEADER.unpack_from(data, offset)[0]
+                start = offset + RECORD_HEADER.size
+                yield json_codec.loads(data[start:start + length])
+                offset = start + length
+
+    def __len__(self):
+        return len(self._index)
+
+    def close(self):
+        """Flush, sync and release files and memory maps"""
+        with self._lock:
+            if self._file:
+                self._file.flush()
+                self._sync(force=True)
+                self._file.close()
+                self._file = None
+            for data in self._maps.values():
+                data.close()
+            self._maps.clear()
+            if self._dir_lock:
+                self._dir_lock.close()
+                self._dir_lock = None
+
+    def status(self):
+        """Log state for health reporting"""
+        return {
+            'segments': len(self._segments),
+            'events': len(self._index),
+            'fsync': self.fsync,
+            **self.stats
+        }
@@ -0,0 +1,137 @@
+import argparse
+import multiprocessing
+import signal
+import time
+import logging
+
+from flask_socketio import SocketIO
+
+from config import app_config, broadcast_config, db_config, outbox_config, worker_config
+from db_pool import ConnectionPool
+from event_handlers import SUBSCRIBERS
+from outbox import PARTITION_KEYS, OutboxWorker
+from socket_broadcast import EventBroadcaster
+
+LOG_FORMAT = '%(asctime)s %(processName)s %(levelname)s %(name)s: %(message)s'
+
+logger = logging.getLogger(__name__)
+
+def make_handler(broadcaster):
+    """Run the subscribers for each claimed event in order, then emit the batch to WebSocket clients"""
+    def handle_events(events):
+        for event in events:
+            for callback in SUBSCRIBERS.get(event['type'], ()):
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.error(f"Error in event callback: {e}")
+        if broadcaster:
+            broadcaster.add_many(events)
+    return handle_events
+
+def run_worker(index, processes, partition_by, stop_event, counters):
+    """Body of one worker process: claim and handle this process's partition until stopped"""
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    # The parent owns Ctrl-C and tells the pool to stop through stop_event. Signal handlers
+    # only set a flag: touching stop_event there can deadlock with a wait() in progress.
+    terminated = []
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: terminated.append(signum))
+
+    broadcaster = None
+    if app_config.socketio_message_queue:
+        # Write-only Socket.IO server: emits go through the queue to the web processes' clients
+        emitter = SocketIO(message_queue=app_config.socketio_message_queue)
+        broadcaster = EventBroadcaster(emitter, max_batch_size=broadcast_config.max_batch_size, route_to_rooms=True)
+
+    pool = ConnectionPool(db_config)
+    worker = OutboxWorker(
+        pool.acquire,
+        make_handler(broadcaster),
+        batch_size=outbox_config.batch_size,
+        poll_interval=outbox_config.poll_interval_ms / 1000,
+        workers=1,
+        name=f'worker-{index}',
+        partition_by=partition_by,
+        partitions=processes,
+        partition=index
+    )
+    worker.start()
+    logger.info(f"Claiming partition {index}/{processes} by {partition_by}")
+    # A restarted worker keeps adding to its predecessor's count
+    base = counters[index]
+    while not terminated and not stop_event.wait(1.0):
+        counters[index] = base + worker.stats['events']
+    worker.stop()
+    counters[index] = base + worker.stats['events']
+    pool.close()
+
+def start_worker(index, args, stop_event, counters):
+    process = multiprocessing.Process(
+        target=run_worker,
+        args=(index, args.processes, args.partition_by, stop_event, counters),
+        name=f'event-worker-{index}'
+    )
+    process.start()
+    return process
+
+def report(counters, previous, elapsed):
+    """Log per-worker throughput since the previous report"""
+    current = list(counters)
+    lines = [f"worker-{index}: {total} events ({(total - before) / elapsed:.1f}/s)"
+             for index, (total, before) in enumerate(zip(current, previous))]
+    logger.info(f"Throughput over {elapsed:.0f}s: " + ', '.join(lines))
+    return current
+
+def main():
+    parser = argparse.ArgumentParser(description='Run outbox event workers as separate processes')
+    parser.add_argument('--processes', type=int, default=worker_config.processes,
+                        help='number of worker processes (one partition each)')
+    parser.add_argument('--partition-by', choices=sorted(PARTITION_KEYS), default=worker_config.partition_by,
+                        help='event key that keeps per-key ordering')
+    parser.add_argument('--report-interval', type=float, default=worker_config.report_interval,
+                        help='seconds between throughput reports')
+    args = parser.parse_args()
+    if args.processes < 1:
+        parser.error('--processes must be at least 1')
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    if outbox_config.workers:
+        logger.warning("EVENT_OUTBOX_WORKERS is not 0: in-process web workers also claim events, "
+                       "so per-key ordering is only kept if the web process runs with EVENT_OUTBOX_WORKERS=0")
+    if not app_config.socketio_message_queue:
+        logger.warning("SOCKETIO_MESSAGE_QUEUE is not set: events are processed but not emitted to WebSocket clients")
+
+    stop_event = multiprocessing.Event()
+    counters = multiprocessing.Array('q', args.processes)
+    processes = [start_worker(index, args, stop_event, counters) for index in range(args.processes)]
+
+    stopping = []
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+    started = last_report = time.monotonic()
+    previous = [0] * args.processes
+    while not stopping:
+        time.sleep(min(1.0, args.report_interval))
+        for index, process in enumerate(processes):
+            if not process.is_alive():
+                # Keep every partition owned; the replacement resumes from the outbox
+                logger.error(f"{process.name} exited with code {process.exitcode}, restarting it")
+                processes[index] = start_worker(index, args, stop_event, counters)
+        now = time.monotonic()
+        if now - last_report >= args.report_interval:
+            previous = report(counters, previous, now - last_report)
+            last_report = now
+
+    logger.info("Stopping workers after their current batch...")
+    stop_event.set()
+    for process in processes:
+        process.join(outbox_config.poll_interval_ms / 1000 + 30)
+        if process.is_alive():
+            logger.warning(f"{process.name} did not stop in time, terminating it")
+            process.terminate()
+    report(counters, [0] * args.processes, time.monotonic() - started)
+
+if __name__ == '__main__':
+    main()
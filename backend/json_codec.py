@@ -0,0 +1,125 @@
+import json
+import logging
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from flask.json.provider import JSONProvider
+
+from config import app_config
+
+try:
+    import orjson
+except ImportError:  # orjson and msgspec are optional; the stdlib json module is the fallback
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+# Preference order for JSON_CODEC=auto
+BACKENDS = ('orjson', 'msgspec', 'stdlib')
+
+def default(obj):
+    """Encode types JSON has no notation for: datetimes as ISO 8601, Decimals as exact strings"""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+class Codec:
+    """Stdlib json, compact and with default() for datetime and Decimal"""
+    name = 'stdlib'
+
+    def dumps(self, obj):
+        return json.dumps(obj, default=default, separators=(',', ':'))
+
+    def dumpb(self, obj):
+        return self.dumps(obj).encode()
+
+    def loads(self, data):
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+class OrjsonCodec(Codec):
+    """orjson: datetimes are native (same text as isoformat()); Decimal goes through default()"""
+    name = 'orjson'
+
+    def dumpb(self, obj):
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+    def dumps(self, obj):
+        return self.dumpb(obj).decode()
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+class MsgspecCodec(Codec):
+    """msgspec: datetimes and Decimals (as strings) are native"""
+    name = 'msgspec'
+
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder(enc_hook=default)
+        self._decoder = msgspec.json.Decoder()
+
+    def dumpb(self, obj):
+        return self._encoder.encode(obj)
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj).decode()
+
+    def loads(self, data):
+        try:
+            return self._decoder.decode(data)
+        except msgspec.DecodeError as e:
+            # Callers (Flask, bulk NDJSON parsing) treat ValueError as malformed JSON
+            raise ValueError(str(e)) from e
+
+def get_codec(name='auto'):
+    """The named codec, the fastest installed one for 'auto', or stdlib if the named one is missing"""
+    available = {'orjson': orjson is not None, 'msgspec': msgspec is not None, 'stdlib': True}
+    if name == 'auto':
+        name = next(backend for backend in BACKENDS if available[backend])
+    elif name not in available:
+        raise ValueError(f'JSON codec must be auto or one of {BACKENDS}')
+    elif not available[name]:
+        logger.warning(f"JSON codec {name} is not installed, falling back to stdlib json")
+        name = 'stdlib'
+    return {'orjson': OrjsonCodec, 'msgspec': MsgspecCodec, 'stdlib': Codec}[name]()
+
+codec = get_codec(app_config.json_codec)
+
+def dumps(obj, **kwargs):
+    """Encode to str. Stdlib keyword arguments (separators, ...) are accepted and ignored,
+    so this module can be handed to Socket.IO as its json module."""
+    return codec.dumps(obj)
+
+def dumpb(obj):
+    """Encode to UTF-8 bytes (no str round trip with orjson and msgspec)"""
+    return codec.dumpb(obj)
+
+def loads(data, **kwargs):
+    """Decode str or bytes; raises ValueError on malformed input"""
+    return codec.loads(data)
+
+class CodecJSONProvider(JSONProvider):
+    """Flask JSON provider (jsonify, request.get_json) backed by the configured codec.
+
+    Keys keep insertion order rather than being sorted as Flask's default provider does.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return codec.dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return codec.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(codec.dumpb(obj), mimetype='application/json')
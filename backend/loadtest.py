@@ -0,0 +1,358 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+try:
+    import socketio
+except ImportError:  # Only needed for --clients; pip install "python-socketio[client]"
+    socketio = None
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 'memory' boots the in-memory app; 'sql' boots app.py with mock_odbc standing in for pyodbc
+TARGETS = {
+    'memory': {'command': ['app_socketio_complete.py'], 'port': 5001},
+    'sql': {'command': ['-c', "import sys, runpy, mock_odbc; sys.modules['pyodbc'] = mock_odbc; "
+                              "runpy.run_path('app.py', run_name='__main__')"], 'port': 5000}
+}
+
+SCENARIOS = ('users', 'transactions', 'events')
+# app.py only accepts Socket.IO connections from the dashboard's origin
+DASHBOARD_ORIGIN = 'http://localhost:3000'
+TRANSACTION_TYPES = ('deposit', 'withdrawal', 'transfer')
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize_latencies(seconds):
+    """p50/p90/p99/max/mean in milliseconds"""
+    ordered = sorted(seconds)
+    if not ordered:
+        return {}
+    return {
+        'p50': round(percentile(ordered, 50) * 1000, 3),
+        'p90': round(percentile(ordered, 90) * 1000, 3),
+        'p99': round(percentile(ordered, 99) * 1000, 3),
+        'max': round(ordered[-1] * 1000, 3),
+        'mean': round(sum(ordered) / len(ordered) * 1000, 3)
+    }
+
+class Server:
+    """A backend booted in its own process group, with its output sent to a log file"""
+
+    def __init__(self, target, env=None, timeout=30.0):
+        self.target = TARGETS[target]
+        self.url = f"http://127.0.0.1:{self.target['port']}"
+        self.env = env or {}
+        self.timeout = timeout
+        self.process = None
+        self.log_path = None
+
+    def start(self):
+        env = dict(os.environ, PYTHONUNBUFFERED='1', **self.env)
+        log = tempfile.NamedTemporaryFile(prefix='loadtest-server-', suffix='.log', delete=False)
+        self.log_path = log.name
+        self.process = subprocess.Popen(
+            [sys.executable, *self.target['command']],
+            cwd=BACKEND_DIR,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=(os.name == 'posix')
+        )
+        log.close()
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self.process.returncode}, see {self.log_path}")
+            try:
+                if request(self.url, 'GET', '/api/health')[0] == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"Server not ready after {self.timeout:.0f}s, see {self.log_path}")
+
+    def stop(self):
+        """Ctrl-C the process group (the debug reloader runs the app in a child) so atexit hooks drain"""
+        if self.process is None or self.process.poll() is not None:
+            return
+        if os.name == 'posix':
+            os.killpg(self.process.pid, signal.SIGINT)
+        else:
+            self.process.terminate()
+        try:
+            self.process.wait(15)
+        except subprocess.TimeoutExpired:
+            if os.name == 'posix':
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+            self.process.wait()
+
+def request(base_url, method, path, body=None):
+    """One HTTP request on a fresh connection; returns (status, decoded JSON or None, seconds)"""
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    payload = json.dumps(body) if body is not None else None
+    started = time.perf_counter()
+    try:
+        conn.request(method, path, payload, headers)
+        response = conn.getresponse()
+        raw = response.read()
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+    try:
+        data = json.loads(raw) if raw else None
+    except ValueError:
+        data = None
+    return response.status, data, elapsed
+
+def run_scenario(base_url, requests, concurrency):
+    """Send (method, path, body) requests from concurrency threads; returns the summary and response bodies"""
+    def send(spec):
+        try:
+            return request(base_url, *spec)
+        except OSError as e:
+            return type(e).__name__, None, None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, requests))
+    wall = time.perf_counter() - started
+
+    statuses = Counter(str(status) for status, _, _ in results)
+    ok = [elapsed for status, _, elapsed in results if isinstance(status, int) and status < 400]
+    summary = {
+        'requests': len(results),
+        'errors': len(results) - len(ok),
+        'statuses': dict(statuses),
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(len(ok) / wall, 1) if wall else None,
+        'latency_ms': summarize_latencies(ok)
+    }
+    return summary, [data for status, data, _ in results if isinstance(status, int) and status < 400]
+
+class SocketClients:
+    """N Socket.IO clients subscribed to every event, recording publish-to-receive latency.
+
+    Latency is receive time minus the event's timestamp, which the server sets
+    when it publishes (app_socketio_complete.py) or stages (app.py) the event;
+    both processes share this machine's clock.
+    """
+
+    def __init__(self, base_url, count, origin=DASHBOARD_ORIGIN):
+        if socketio is None:
+            raise RuntimeError('--clients needs the Socket.IO client: pip install "python-socketio[client]"')
+        self.base_url = base_url
+        self.clients = [socketio.Client(reconnection=False, websocket_extra_options={'origin': origin})
+                        for _ in range(count)]
+        self.received = [0] * count
+        self.latencies = []
+        self.resyncs = 0
+        self._lock = threading.Lock()
+
+    def connect(self):
+        for index, client in enumerate(self.clients):
+            self._register(index, client)
+            client.connect(self.base_url, transports=['websocket'])
+            client.emit('subscribe', {'types': ['*']})
+
+    def _register(self, index, client):
+        @client.on('events_batch')
+        def on_batch(batch):
+            now = datetime.now()
+            latencies = [(now - datetime.fromisoformat(event['timestamp'])).total_seconds()
+                         for event in batch['events'] if event.get('timestamp')]
+            with self._lock:
+                self.received[index] += len(batch['events'])
+                self.latencies.extend(latencies)
+            client.emit('events_ack', {'seq': batch['seq']})
+
+        @client.on('resync_required')
+        def on_resync(data):
+            with self._lock:
+                self.resyncs += 1
+            client.emit('events_resume')
+
+    def wait_for(self, expected, timeout):
+        """Wait until every client has received expected events (or timeout); True if they all did"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if min(self.received) >= expected:
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def disconnect(self):
+        for client in self.clients:
+            client.disconnect()
+
+    def summary(self, expected):
+        with self._lock:
+            return {
+                'clients': len(self.clients),
+                'expected_events_per_client': expected,
+                'received_events': sum(self.received),
+                'missing_events': sum(max(0, expected - received) for received in self.received),
+                'resyncs': self.resyncs,
+                'latency_ms': summarize_latencies(self.latencies)
+            }
+
+def build_requests(scenario, count, tag, rng, user_ids=(), events_limit=50):
+    """The (method, path, body) requests of one scenario; tag keeps emails unique across runs"""
+    if scenario == 'users':
+        return [('POST', '/api/users', {'name': f'Load {tag} {index}', 'email': f'load-{tag}-{index}@example.com'})
+                for index in range(count)]
+    if scenario == 'transactions':
+        return [('POST', '/api/transactions', {
+            'user_id': user_ids[index % len(user_ids)],
+            'amount': round(rng.uniform(1, 1000), 2),
+            'type': rng.choice(TRANSACTION_TYPES)
+        }) for index in range(count)]
+    return [('GET', f'/api/events?limit={events_limit}', None)] * count
+
+def run(args, base_url):
+    """Run the selected scenarios against a ready server and return the results document"""
+    started_at = datetime.now().isoformat()
+    tag = uuid.uuid4().hex[:8]
+    rng = random.Random(args.seed)
+    clients = None
+    if args.clients:
+        clients = SocketClients(base_url, args.clients)
+        clients.connect()
+
+    results = {}
+    user_ids = []
+    published = 0
+    for scenario in args.scenarios:
+        if scenario == 'transactions' and not user_ids:
+            # Transactions need existing users to point at
+            _, bodies = run_scenario(base_url, build_requests('users', 10, f'{tag}-seed', rng), 1)
+            user_ids = [body['id'] for body in bodies]
+            published += len(user_ids)
+        logger.info(f"{scenario}: {args.requests} requests at concurrency {args.concurrency}")
+        requests = build_requests(scenario, args.requests, tag, rng, user_ids, args.events_limit)
+        summary, bodies = run_scenario(base_url, requests, args.concurrency)
+        results[scenario] = summary
+        if scenario == 'users':
+            user_ids = [body['id'] for body in bodies]
+        if scenario in ('users', 'transactions'):
+            published += len(bodies)
+        logger.info(f"{scenario}: {summary['throughput_rps']} req/s, p50 {summary['latency_ms'].get('p50')} ms, "
+                    f"p99 {summary['latency_ms'].get('p99')} ms, {summary['errors']} errors")
+
+    document = {
+        'run': {
+            'target': args.target or args.url,
+            'started_at': started_at,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+            'env': dict(args.env),
+            'python': sys.version.split()[0]
+        },
+        'scenarios': results
+    }
+    if clients:
+        if not clients.wait_for(published, args.drain_timeout):
+            logger.warning(f"Socket.IO clients did not receive all {published} events within {args.drain_timeout:.0f}s")
+        document['socketio'] = clients.summary(published)
+        clients.disconnect()
+    return document
+
+def compare(current, baseline):
+    """Log p50/p99/throughput changes against a previous results file"""
+    for scenario, summary in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(scenario)
+        if not before:
+            continue
+        changes = []
+        for label, now, then in (
+            ('throughput', summary['throughput_rps'], before.get('throughput_rps')),
+            ('p50', summary['latency_ms'].get('p50'), before.get('latency_ms', {}).get('p50')),
+            ('p99', summary['latency_ms'].get('p99'), before.get('latency_ms', {}).get('p99'))
+        ):
+            if now is not None and then:
+                changes.append(f"{label} {then} -> {now} ({(now - then) / then * 100:+.1f}%)")
+        logger.info(f"{scenario} vs baseline: " + ', '.join(changes))
+
+def parse_env(value):
+    key, sep, val = value.partition('=')
+    if not sep or not key:
+        raise argparse.ArgumentTypeError('expected KEY=VALUE')
+    return key, val
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the HTTP and Socket.IO paths and write results as JSON')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--target', choices=sorted(TARGETS), default='memory',
+                        help='backend to boot: memory (app_socketio_complete.py) or sql (app.py on mock_odbc)')
+    source.add_argument('--url', help='use an already running server instead of booting one')
+    parser.add_argument('--scenarios', type=lambda value: value.split(','), default=list(SCENARIOS),
+                        help=f"comma-separated subset of {','.join(SCENARIOS)}, run in that order")
+    parser.add_argument('--requests', type=int, default=1000, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent HTTP requests')
+    parser.add_argument('--clients', type=int, default=0, help='Socket.IO clients measuring publish-to-receive latency')
+    parser.add_argument('--events-limit', type=int, default=50, help='page size for GET /api/events')
+    parser.add_argument('--drain-timeout', type=float, default=30.0,
+                        help='seconds to wait for Socket.IO clients to receive every event')
+    parser.add_argument('--seed', type=int, default=1, help='seed for generated transaction amounts and types')
+    parser.add_argument('--env', type=parse_env, action='append', default=[], metavar='KEY=VALUE',
+                        help='environment for the booted server, e.g. --env EVENT_QUEUE_OVERFLOW=reject')
+    parser.add_argument('--output', default='loadtest-results.json', help='results file')
+    parser.add_argument('--compare', help='previous results file to compare against')
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.requests < 1 or args.concurrency < 1:
+        parser.error('--requests and --concurrency must be at least 1')
+    if args.url:
+        args.target = None
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    server = None
+    if not args.url:
+        server = Server(args.target, dict(args.env))
+        server.start()
+        logger.info(f"Booted {args.target} backend at {server.url}, server output in {server.log_path}")
+    try:
+        document = run(args, args.url or server.url)
+    finally:
+        if server:
+            server.stop()
+
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2)
+    logger.info(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(document, json.load(f))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+import threading
+from bisect import bisect_right
+from collections import defaultdict, deque
+from datetime import datetime
+from itertools import islice
+
+from columnar_store import ColumnarTransactionStore
+from etag import CollectionVersions
+
+class RecentEvents:
+    """Bounded ring buffer of the newest events, kept in (timestamp, id) order.
+
+    Events normally arrive in timestamp order, so add() is an O(1) append;
+    the rare out-of-order arrival is inserted at its sorted position. Reading
+    the latest N events is O(N) and never sorts the full history.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self._events = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event):
+        # ISO 8601 strings from datetime.isoformat() sort chronologically
+        return (event['timestamp'], event['id'])
+
+    def add(self, event):
+        """Insert an event, evicting the oldest once the buffer is full"""
+        key = self._key(event)
+        with self._lock:
+            events = self._events
+            if not events or key >= self._key(events[-1]):
+                events.append(event)
+                return
+            if len(events) == self.capacity:
+                if key < self._key(events[0]):
+                    # Older than everything retained
+                    return
+                events.popleft()
+            index = len(events)
+            while index > 0 and self._key(events[index - 1]) > key:
+                index -= 1
+            events.insert(index, event)
+
+    def latest(self, n):
+        """The newest n events, newest first"""
+        with self._lock:
+            return list(islice(reversed(self._events), n))
+
+    def __len__(self):
+        return len(self._events)
+
+class DuplicateEmailError(ValueError):
+    """Raised when a user is added with an email that is already taken"""
+
+class InMemoryRepository:
+    """In-memory users, transactions and events with hash indexes.
+
+    Users and events are insertion-ordered lists for listings; transactions
+    live in a ColumnarTransactionStore. Lookups by id, email, user_id and
+    event type go through indexes instead of scanning.
+    Email uniqueness is case-insensitive, matching the SQL Server collation.
+    Every write bumps its collection in versions, which listings use as ETags.
+    """
+
+    def __init__(self, recent_capacity=1000):
+        self.users = []
+        self.transactions = ColumnarTransactionStore()
+        self.events = []
+        self.recent_events = RecentEvents(recent_capacity)
+        self.versions = CollectionVersions('users', 'transactions', 'events')
+        self._users_by_id = {}
+        self._users_by_email = {}
+        self._events_by_id = {}
+        self._events_by_type = defaultdict(list)
+        self._next_user_id = 1
+        self._last_event_id = 0
+        self._lock = threading.Lock()
+
+    def add_user(self, name, email, created_at=None, user_id=None):
+        """Create a user (with the next id unless one is given); raises DuplicateEmailError if the email exists"""
+        key = email.lower()
+        with self._lock:
+            if key in self._users_by_email:
+                raise DuplicateEmailError(email)
+            if user_id is None:
+                user_id = self._next_user_id
+            self._next_user_id = max(self._next_user_id, user_id + 1)
+            user = {
+                'id': user_id,
+                'name': name,
+                'email': email,
+                'created_at': created_at or datetime.now().isoformat()
+            }
+            self.users.append(user)
+            self._users_by_id[user['id']] = user
+            self._users_by_email[key] = user
+        self.versions.bump('users')
+        return user
+
+    def get_user(self, user_id):
+        return self._users_by_id.get(user_id)
+
+    def get_user_by_email(self, email):
+        return self._users_by_email.get(email.lower())
+
+    def add_transaction(self, user_id, amount, transaction_type, created_at=None, transaction_id=None):
+        """Create a transaction (with the next id unless one is given) and return its row view"""
+        transaction = self.transactions.append(user_id, amount, transaction_type, created_at, transaction_id)
+        self.versions.bump('transactions')
+        return transaction
+
+    def get_transaction(self, transaction_id):
+        return self.transactions.get(transaction_id)
+
+    def transactions_for_user(self, user_id):
+        """A user's transactions, oldest first"""
+        return self.transactions.for_user(user_id)
+
+    def next_event_id(self):
+        """Allocate a unique, increasing event id at publish time"""
+        with self._lock:
+            self._last_event_id += 1
+            return self._last_event_id
+
+    def add_event(self, event):
+        """Store a processed event and index it by id and type"""
+        with self._lock:
+            self._last_event_id = max(self._last_event_id, event['id'])
+            self.events.append(event)
+            self._events_by_id[event['id']] = event
+            self._events_by_type[event['type']].append(event)
+        self.recent_events.add(event)
+        self.versions.bump('events')
+
+    def get_event(self, event_id):
+        return self._events_by_id.get(event_id)
+
+    def last_event_id(self):
+        """Highest event id allocated or stored so far"""
+        return self._last_event_id
+
+    def stored_event_id(self):
+        """Id of the newest stored event, 0 when there are none"""
+        events = self.events
+        return events[-1]['id'] if events else 0
+
+    def events_after(self, event_id, limit=None):
+        """Stored events with an id greater than event_id, oldest first (events are stored in id order)"""
+        with self._lock:
+            start = bisect_right(self.events, event_id, key=lambda event: event['id'])
+            end = len(self.events) if limit is None else min(len(self.events), start + limit)
+            return self.events[start:end]
+
+    def events_of_type(self, event_type):
+        return self._events_by_type.get(event_type, [])
+
+    def restore(self, events):
+        """Rebuild state from a replayed event history.
+
+        Events are stored as-is; users and transactions are re-created from
+        user_created and transaction_processed events in id order (the log is
+        in processing order, which can differ slightly from creation order).
+        Anything already present, e.g. loaded from a snapshot, is skipped.
+        """
+        users = []
+        transactions = []
+        for event in events:
+            if event['id'] in self._events_by_id:
+                continue
+            self.add_event(event)
+            if event['type'] == 'user_created':
+                users.append(event)
+            elif event['type'] == 'transaction_processed':
+                transactions.append(event)
+
+        restored_users = restored_transactions = 0
+        for event in sorted(users, key=lambda e: e['data']['user_id']):
+            data = event['data']
+            if data['user_id'] in self._users_by_id:
+                continue
+            try:
+                self.add_user(data['name'], data['email'], event['timestamp'], data['user_id'])
+                restored_users += 1
+            except DuplicateEmailError:
+                continue
+        for event in sorted(transactions, key=lambda e: e['data']['transaction_id']):
+            data = event['data']
+            if self.transactions.get(data['transaction_id']) is not None:
+                continue
+            self.add_transaction(int(data['user_id']), data['amount'], data['type'],
+                                 event['timestamp'], data['transaction_id'])
+            restored_transactions += 1
+        return restored_users, restored_transactions
+
+    def export_state(self):
+        """Point-in-time copy of users, events and transaction columns for snapshots"""
+        with self._lock:
+            users = list(self.users)
+            events = list(self.events)
+        return {'users': users, 'events': events, 'transactions': self.transactions.export_columns()}
+
+    def load_state(self, state):
+        """Replace the contents with an export_state() copy and rebuild the indexes.
+
+        Lists are updated in place so module-level aliases (users_db, ...) stay valid.
+        """
+        with self._lock:
+            self.users[:] = state['users']
+            self.events[:] = state['events']
+            self._users_by_id = {user['id']: user for user in self.users}
+            self._users_by_email = {user['email'].lower(): user for user in self.users}
+            self._events_by_id = {event['id']: event for event in self.events}
+            self._events_by_type = defaultdict(list)
+            for event in self.events:
+                self._events_by_type[event['type']].append(event)
+            self._next_user_id = max(self._users_by_id, default=0) + 1
+            self._last_event_id = max(self._events_by_id, default=0)
+        self.recent_events = RecentEvents(self.recent_events.capacity)
+        for event in self.events[-self.recent_events.capacity:]:
+            self.recent_events.add(event)
+        self.transactions.load_columns(state['transactions'])
+        for name in ('users', 'transactions', 'events'):
+            self.versions.bump(name)
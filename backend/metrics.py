@@ -0,0 +1,172 @@
+import math
+import threading
+import time
+import logging
+from bisect import bisect_left
+
+from flask import Response, g, request
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+class Registry:
+    """Metrics in registration order, rendered in the Prometheus text format on scrape"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        # Re-registering a name replaces it, so a reloaded module does not duplicate series
+        with self._lock:
+            self._metrics[metric.name] = metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                logger.error(f"Error collecting metric {metric.name}: {e}")
+                continue
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+class Histogram(Metric):
+    """Fixed-bucket histogram; observe() is one bisect plus two additions under a lock"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._children = {}
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._children.get(labels)
+            if child is None:
+                child = self._children[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            child[0][index] += 1
+            child[1] += value
+
+    def time(self, *labels):
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            children = [(labels, list(counts), total) for labels, (counts, total) in self._children.items()]
+        for labels, counts, total in children:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+class Callback(Metric):
+    """Gauge or counter read from a function at scrape time, so there is no cost between scrapes.
+
+    fn returns a number, or a dict of label values tuple -> number.
+    """
+
+    def __init__(self, name, documentation, fn, kind='gauge', labelnames=()):
+        self.kind = kind
+        self.fn = fn
+        super().__init__(name, documentation, labelnames)
+
+    def samples(self):
+        value = self.fn()
+        if not isinstance(value, dict):
+            value = {(): value}
+        for labels, number in value.items():
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(number)}'
+
+# Instruments shared by the web apps, the database pool and the event processors
+HTTP_REQUEST_SECONDS = Histogram('finatech_http_request_duration_seconds',
+                                 'HTTP request latency (to the first byte for streamed responses)',
+                                 ('method', 'route', 'status'))
+DB_CONNECT_SECONDS = Histogram('finatech_db_connect_seconds', 'Time to open a new database connection')
+DB_ACQUIRE_SECONDS = Histogram('finatech_db_pool_acquire_seconds', 'Time to check a connection out of the pool')
+DB_QUERY_SECONDS = Histogram('finatech_db_query_duration_seconds', 'Statement execution time', ('operation',))
+PUBLISH_SECONDS = Histogram('finatech_event_publish_seconds',
+                            'Event publish time by stage (queue, subscribers, emit)', ('stage',))
+EVENT_BATCH_SECONDS = Histogram('finatech_event_batch_duration_seconds',
+                                'Event processor batch handling time', ('processor',))
+EVENT_BATCH_SIZE = Histogram('finatech_event_batch_size', 'Events per processor batch', ('processor',),
+                             buckets=SIZE_BUCKETS)
+
+def instrument_app(app):
+    """Time every request into HTTP_REQUEST_SECONDS, labelled by route template rather than URL.
+
+    Call it right after creating the app so its hook runs before any other
+    before_request hook (and still sees requests those hooks answer early).
+    """
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_latency(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, route, response.status_code)
+        return response
+
+def metrics_response():
+    """Flask response with every registered metric"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
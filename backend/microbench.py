@@ -0,0 +1,244 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+import json_codec
+from backpressure import BoundedEventQueue
+from socket_broadcast import EventBroadcaster
+from subscriber_dispatch import SubscriberDispatcher
+
+SUBSCRIBER_COUNTS = (0, 1, 10, 100)
+
+SAMPLE_TRANSACTION = {'transaction_id': 1234, 'user_id': 42, 'amount': 250.75, 'type': 'deposit'}
+
+def make_subscribers(count):
+    """Distinct no-op callbacks, so the async dispatcher gives each its own concurrency limit"""
+    def make():
+        def noop_subscriber(event):
+            pass
+        return noop_subscriber
+    return [make() for _ in range(count)]
+
+class NullBroadcaster:
+    """Stands in for EventBroadcaster when a case runs without Socket.IO emit"""
+
+    def add(self, event):
+        pass
+
+    def flush(self):
+        pass
+
+    def stop(self):
+        pass
+
+class BenchSocketIO:
+    """The app's SocketIO with emit replaced by payload encoding, so frames are built and serialized
+    as in production but nothing is written to a socket"""
+
+    def __init__(self, socketio):
+        self.socketio = socketio
+        self.server = self
+        self.frames = 0
+
+    def emit(self, event, payload, **kwargs):
+        json_codec.dumps(payload)
+        self.frames += 1
+
+    def enter_room(self, sid, room, namespace=None):
+        pass
+
+    def leave_room(self, sid, room, namespace=None):
+        pass
+
+    def start_background_task(self, target, *args, **kwargs):
+        return self.socketio.start_background_task(target, *args, **kwargs)
+
+    def sleep(self, seconds):
+        return self.socketio.sleep(seconds)
+
+class Benchmark:
+    """One case: setup() before each timed run, body(n) does n operations, teardown() after"""
+
+    def __init__(self, name, body, setup=None, teardown=None):
+        self.name = name
+        self.body = body
+        self.setup = setup
+        self.teardown = teardown
+
+    def run(self, number, repeat):
+        """Best of repeat timed runs of number operations"""
+        best = None
+        for _ in range(repeat):
+            if self.setup:
+                self.setup(number)
+            started = time.perf_counter()
+            self.body(number)
+            elapsed = time.perf_counter() - started
+            if self.teardown:
+                self.teardown()
+            best = elapsed if best is None else min(best, elapsed)
+        return {
+            'events_per_sec': round(number / best, 1),
+            'us_per_event': round(best / number * 1e6, 3)
+        }
+
+def publish_case(app, subscribers, emit, log, dispatch='inline'):
+    """EventBus.publish of app_socketio_complete.py with the given subscribers, emit and logging.
+
+    Every run gets a fresh unbounded queue so the consumer-less queue never
+    blocks. With emit the broadcaster runs as in production (events are
+    buffered and a background task sends one events_batch frame per window)
+    for one client subscribed to every type, and each timed run ends with a
+    flush, so frame building and encoding are part of the measurement.
+    """
+    state = {}
+
+    def setup(number):
+        app.event_queue = BoundedEventQueue(maxsize=0)
+        app.event_bus.subscribers = {'transaction_processed': make_subscribers(subscribers)} if subscribers else {}
+        if dispatch == 'async':
+            state['dispatcher'] = SubscriberDispatcher(max_workers=4, max_pending=number + 1,
+                                                       per_subscriber_limit=1, timeout=60)
+        else:
+            state['dispatcher'] = None
+        app.event_bus.dispatcher = state['dispatcher']
+        if emit:
+            app.event_broadcaster = EventBroadcaster(BenchSocketIO(app.socketio))
+            app.event_broadcaster.client_connected('bench')
+            app.event_broadcaster.subscribe('bench', {'types': ['*']})
+            app.event_broadcaster.start()
+        else:
+            app.event_broadcaster = NullBroadcaster()
+        app.logger.setLevel(logging.INFO if log else logging.WARNING)
+
+    def body(number):
+        publish = app.event_bus.publish
+        for _ in range(number):
+            publish('transaction_processed', SAMPLE_TRANSACTION)
+        app.event_broadcaster.flush()
+
+    def teardown():
+        app.event_broadcaster.stop()
+        if state['dispatcher']:
+            state['dispatcher'].shutdown()
+
+    name = f"publish subscribers={subscribers} emit={'on' if emit else 'off'} log={'on' if log else 'off'}"
+    if dispatch != 'inline':
+        name += f' dispatch={dispatch}'
+    return Benchmark(name, body, setup, teardown)
+
+def serialization_cases():
+    """Event dict creation and JSON encoding, the per-event work outside EventBus bookkeeping"""
+    def timestamp(number):
+        for _ in range(number):
+            datetime.now().isoformat()
+
+    def event_dict(number):
+        for index in range(number):
+            {'type': 'transaction_processed', 'data': SAMPLE_TRANSACTION,
+             'timestamp': datetime.now().isoformat(), 'id': index}
+
+    event = {'type': 'transaction_processed', 'data': SAMPLE_TRANSACTION,
+             'timestamp': datetime.now().isoformat(), 'id': 1}
+
+    # Encoded through json_codec, as Socket.IO and the JSON responses do in production
+    def encode_event(number):
+        dumps = json_codec.dumps
+        for _ in range(number):
+            dumps(event)
+
+    frame = {'seq': 1, 'events': [dict(event, id=index) for index in range(500)]}
+
+    def encode_frame(number):
+        # Measured per event: one 500-event events_batch frame per 500 operations
+        dumps = json_codec.dumps
+        for _ in range(max(1, number // 500)):
+            dumps(frame)
+
+    return [
+        Benchmark('timestamp isoformat', timestamp),
+        Benchmark('event dict', event_dict),
+        Benchmark('json encode event', encode_event),
+        Benchmark('json encode 500-event frame', encode_frame)
+    ]
+
+def load_app():
+    """Import the in-memory app with its log output sent to /dev/null (formatting still happens)"""
+    import app_socketio_complete as app
+    handler = logging.StreamHandler(open(os.devnull, 'w'))
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    logging.root.handlers = [handler]
+    logging.root.setLevel(logging.INFO)
+    return app
+
+def all_cases(app):
+    cases = [publish_case(app, subscribers, emit, log)
+             for subscribers in SUBSCRIBER_COUNTS for emit in (False, True) for log in (False, True)]
+    cases.append(publish_case(app, 10, emit=False, log=False, dispatch='async'))
+    return cases + serialization_cases()
+
+def find_regressions(results, baseline, threshold):
+    """Cases whose events/sec fell more than threshold (a fraction) below the baseline"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('benchmarks', {}).get(name)
+        if not before:
+            continue
+        floor = before['events_per_sec'] * (1 - threshold)
+        if result['events_per_sec'] < floor:
+            regressions.append(f"{name}: {result['events_per_sec']:,.0f}/s vs baseline "
+                               f"{before['events_per_sec']:,.0f}/s (floor {floor:,.0f}/s)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmark EventBus publish/dispatch and event serialization')
+    parser.add_argument('--number', type=int, default=20000, help='operations per timed run')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case (the best is kept)')
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this text')
+    parser.add_argument('--output', help='write results as JSON, e.g. to use as a later baseline')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed events/sec drop against the baseline before failing (0.2 = 20%%)')
+    args = parser.parse_args()
+    if args.number < 1 or args.repeat < 1:
+        parser.error('--number and --repeat must be at least 1')
+
+    app = load_app()
+    results = {}
+    for case in all_cases(app):
+        if args.filter not in case.name:
+            continue
+        results[case.name] = case.run(args.number, args.repeat)
+        print(f"{case.name:<55} {results[case.name]['events_per_sec']:>14,.0f}/s "
+              f"{results[case.name]['us_per_event']:>10.3f} us")
+
+    document = {
+        'run': {
+            'started_at': datetime.now().isoformat(),
+            'number': args.number,
+            'repeat': args.repeat,
+            'python': sys.version.split()[0],
+            'json_codec': json_codec.codec.name
+        },
+        'benchmarks': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+# In-memory pyodbc stand-in so loadtest.py can drive app.py without SQL Server.
+# It is not a SQL engine: it recognises the statements app.py issues and keeps
+# just enough state for users, transactions and the event outbox.
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# Simulated round trip per statement in milliseconds, e.g. 0.5 for a nearby SQL Server
+latency = float(os.environ.get('MOCK_ODBC_LATENCY_MS', 0))
+
+class Error(Exception):
+    pass
+
+class ProgrammingError(Error):
+    pass
+
+class IntegrityError(Error):
+    pass
+
+class _Database:
+    """Shared state behind every mock connection"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = {}
+        self.emails = set()
+        self.transactions = 0
+        self.events = {}
+        # Ids of unprocessed events in id order (the filtered index)
+        self.unprocessed = {}
+        self.claimed = set()
+        self.next_user_id = 1
+        self.next_event_id = 1
+
+_db = _Database()
+
+def _as_datetime(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+class Cursor:
+    """Recognises the statements app.py issues; anything else raises ProgrammingError.
+
+    Writes are buffered on the connection and applied on commit, so outbox
+    events only become claimable once the request that staged them commits.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.fast_executemany = False
+        self._rows = []
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (tuple, list)):
+            params = tuple(params[0])
+        if latency:
+            time.sleep(latency / 1000)
+        self._rows = self._run(' '.join(sql.split()), params)
+        return self
+
+    def executemany(self, sql, seq):
+        sql = ' '.join(sql.split())
+        if not sql.startswith('INSERT INTO Events'):
+            raise ProgrammingError(f'mock_odbc does not support executemany of: {sql[:60]}')
+        if latency:
+            time.sleep(latency / 1000)
+        for event_type, event_data, timestamp in seq:
+            self.connection._pending.append(('event', (event_type, event_data, _as_datetime(timestamp))))
+        self._rows = []
+
+    def _run(self, sql, params):
+        db = _db
+        if sql == 'SELECT 1':
+            return [(1,)]
+        if sql.startswith('INSERT INTO Users'):
+            name, email, created_at = params
+            with db.lock:
+                if email.lower() in db.emails:
+                    raise IntegrityError('Violation of UNIQUE KEY constraint on Users.email')
+                user_id = db.next_user_id
+                db.next_user_id += 1
+                # Reserve the email now so concurrent requests conflict like a unique index would
+                db.emails.add(email.lower())
+            self.connection._pending.append(('user', (user_id, name, email, created_at)))
+            return [(user_id,)]
+        if sql.startswith('INSERT INTO Transactions'):
+            with db.lock:
+                db.transactions += 1
+                return [(db.transactions,)]
+        if sql.startswith('INSERT INTO Events') and 'OPENJSON' in sql:
+            timestamp, payload = params
+            for item in json.loads(payload):
+                self.connection._pending.append(('event', (item['type'], json.dumps(item['data']), timestamp)))
+            return []
+        if sql.startswith('SELECT TOP (?) id, event_type, event_data, timestamp FROM Events WITH (UPDLOCK'):
+            with db.lock:
+                rows = []
+                for event_id in db.unprocessed:
+                    if event_id not in db.claimed:
+                        rows.append((event_id, *db.events[event_id]))
+                        if len(rows) == params[0]:
+                            break
+                claimed = {row[0] for row in rows}
+                db.claimed |= claimed
+            self.connection._claimed |= claimed
+            return rows
+        if sql.startswith('UPDATE Events SET processed = 1'):
+            self.connection._pending.append(('processed', json.loads(params[0])))
+            return []
+        if sql.startswith('SELECT id, name, email, created_at FROM Users'):
+            with db.lock:
+                return list(db.users.values())
+        if sql.startswith('SELECT TOP (?) id, event_type, event_data, timestamp FROM Events'):
+            # Newest first; of the filters only event_type is honoured
+            limit = params[0]
+            event_type = params[1] if 'event_type = ?' in sql else None
+            with db.lock:
+                rows = []
+                for event_id in reversed(db.events):
+                    row = db.events[event_id]
+                    if event_type is None or row[0] == event_type:
+                        rows.append((event_id, *row))
+                        if len(rows) == limit:
+                            break
+            return rows
+        raise ProgrammingError(f'mock_odbc does not support: {sql[:60]}')
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._rows = []
+
+class Connection:
+    def __init__(self):
+        self._pending = []
+        self._claimed = set()
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        db = _db
+        with db.lock:
+            for kind, item in self._pending:
+                if kind == 'user':
+                    db.users[item[0]] = item
+                elif kind == 'event':
+                    db.events[db.next_event_id] = item
+                    db.unprocessed[db.next_event_id] = None
+                    db.next_event_id += 1
+                else:
+                    for event_id in item:
+                        db.unprocessed.pop(event_id, None)
+            db.claimed -= self._claimed
+        self._pending = []
+        self._claimed = set()
+
+    def rollback(self):
+        db = _db
+        with db.lock:
+            for kind, item in self._pending:
+                if kind == 'user':
+                    db.emails.discard(item[2].lower())
+            db.claimed -= self._claimed
+        self._pending = []
+        self._claimed = set()
+
+    def close(self):
+        self.rollback()
+
+def connect(connection_string, **kwargs):
+    """Open a connection to the process-wide in-memory database"""
+    return Connection()
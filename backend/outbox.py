@@ -0,0 +1,169 @@
+import threading
+import time
+import logging
+
+import json_codec
+from metrics import EVENT_BATCH_SECONDS, EVENT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Outbox rows go in with the business rows they describe, in the same transaction;
+# ORDER BY makes identity values follow the order of the staged events
+STAGE_EVENTS_SQL = """
+    INSERT INTO Events (event_type, event_data, timestamp, processed)
+    SELECT src.event_type, src.event_data, ?, 0
+    FROM OPENJSON(?) WITH (
+        ord INT '$.ord',
+        event_type NVARCHAR(100) '$.type',
+        event_data NVARCHAR(MAX) '$.data' AS JSON
+    ) AS src
+    ORDER BY src.ord
+"""
+
+# UPDLOCK keeps claimed rows locked until the claiming transaction ends and READPAST
+# makes competing workers skip them instead of waiting. The literal processed = 0
+# matches the filter of IX_Events_Unprocessed, so the claim is an index seek.
+CLAIM_EVENTS_SQL = """
+    SELECT TOP (?) id, event_type, event_data, timestamp
+    FROM Events WITH (UPDLOCK, READPAST, ROWLOCK)
+    WHERE processed = 0{partition}
+    ORDER BY id
+"""
+
+# Partition keys for worker pools: every event with the same key goes to the same
+# worker, which handles it in id order. Events without a user_id land in partition 0.
+PARTITION_KEYS = {
+    'user_id': "ISNULL(TRY_CAST(JSON_VALUE(event_data, '$.user_id') AS INT), 0)",
+    'type': "(CHECKSUM(event_type) & 2147483647)"
+}
+
+MARK_PROCESSED_SQL = """
+    UPDATE Events SET processed = 1
+    WHERE id IN (SELECT CAST(value AS INT) FROM OPENJSON(?))
+"""
+
+def event_from_row(row):
+    """Convert an Events row to its API representation"""
+    return {
+        'id': row[0],
+        'type': row[1],
+        'data': json_codec.loads(row[2]) if row[2] else {},
+        'timestamp': row[3].isoformat() if row[3] else None
+    }
+
+def stage_events(cursor, event_type, items, timestamp):
+    """Insert unprocessed events on the caller's cursor; they are delivered once the caller commits"""
+    if not items:
+        return
+    cursor.execute(STAGE_EVENTS_SQL, (timestamp, json_codec.dumps(
+        [{'ord': index, 'type': event_type, 'data': data} for index, data in enumerate(items)])))
+
+class OutboxWorker:
+    """Competing consumers for the Events outbox.
+
+    Each worker thread claims up to batch_size unprocessed events in a
+    transaction, hands them to the handler and marks them processed before
+    committing. If the handler or the process fails, the transaction rolls
+    back and the events are claimed again, so delivery is at-least-once.
+    Workers in other threads or processes skip rows that are already claimed,
+    which means events are handled in id order within a batch but not across
+    workers. Idle workers poll every poll_interval seconds; notify() wakes
+    them as soon as a local request has committed new events.
+
+    With partition_by (a PARTITION_KEYS name) the worker only claims events
+    whose key hashes to partition out of partitions, so a pool with one
+    single-threaded worker per partition keeps per-key ordering.
+    """
+
+    def __init__(self, get_connection, handler, batch_size=100, poll_interval=0.2, workers=1, name='outbox',
+                 partition_by=None, partitions=1, partition=0):
+        self.get_connection = get_connection
+        self.handler = handler
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.workers = workers
+        self.name = name
+        if partition_by:
+            self._claim_sql = CLAIM_EVENTS_SQL.format(partition=f" AND {PARTITION_KEYS[partition_by]} % ? = ?")
+            self._claim_params = (partitions, partition)
+        else:
+            self._claim_sql = CLAIM_EVENTS_SQL.format(partition='')
+            self._claim_params = ()
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {'batches': 0, 'events': 0, 'failed_batches': 0, 'last_batch_size': 0, 'max_batch_ms': 0.0}
+
+    def start(self):
+        """Start the worker threads"""
+        if self._threads:
+            return
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'{self.name}-{index + 1}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=10.0):
+        """Stop the workers; a batch in progress is finished first"""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake idle workers because new events were committed"""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                claimed = self.process_batch()
+            except Exception as e:
+                with self._lock:
+                    self.stats['failed_batches'] += 1
+                logger.error(f"Error processing outbox batch: {e}")
+                claimed = 0
+            if claimed < self.batch_size:
+                # Drained (or failing): sleep until notified or the next poll
+                self._wakeup.wait(self.poll_interval)
+
+    def process_batch(self):
+        """Claim, handle and mark one batch; returns the number of events handled"""
+        conn = self.get_connection()
+        if not conn:
+            raise ConnectionError('Database connection failed')
+        started = time.perf_counter()
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute(self._claim_sql, (self.batch_size, *self._claim_params))
+            rows = cursor.fetchall()
+            if not rows:
+                conn.commit()
+                return 0
+            events = [event_from_row(row) for row in rows]
+            self.handler(events)
+            cursor.execute(MARK_PROCESSED_SQL, json_codec.dumps([event['id'] for event in events]))
+            conn.commit()
+
+        elapsed = time.perf_counter() - started
+        batch_ms = elapsed * 1000
+        EVENT_BATCH_SECONDS.observe(elapsed, self.name)
+        EVENT_BATCH_SIZE.observe(len(events), self.name)
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['events'] += len(events)
+            self.stats['last_batch_size'] = len(events)
+            self.stats['max_batch_ms'] = round(max(self.stats['max_batch_ms'], batch_ms), 3)
+        return len(events)
+
+    def status(self):
+        """Worker state for health reporting"""
+        return {
+            'workers': len(self._threads),
+            'batch_size': self.batch_size,
+            **self.stats
+        }
@@ -0,0 +1,110 @@
+import base64
+import json
+from bisect import bisect_left
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+class PaginationError(ValueError):
+    """Raised for malformed pagination or filter parameters"""
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 timestamp into a naive local datetime comparable with stored events"""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = value.strip()
+        if text.endswith('Z'):
+            text = text[:-1] + '+00:00'
+        parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def encode_cursor(timestamp, event_id):
+    """Build an opaque cursor pointing just past the given (timestamp, id) position"""
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.isoformat()
+    raw = json.dumps([timestamp, event_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Decode a cursor produced by encode_cursor into (timestamp, id)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        decoded = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise PaginationError('Invalid cursor') from e
+    # Any JSON decodes, so check the shape before trusting it
+    if not (isinstance(decoded, list) and len(decoded) == 2 and isinstance(decoded[0], str)
+            and isinstance(decoded[1], int) and not isinstance(decoded[1], bool)):
+        raise PaginationError('Invalid cursor')
+    timestamp, event_id = decoded
+    try:
+        return parse_timestamp(timestamp), event_id
+    except ValueError as e:
+        raise PaginationError('Invalid cursor') from e
+
+def parse_event_query(args):
+    """Read limit, cursor, type, since and until from request arguments"""
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+
+    query = {
+        'limit': min(limit, MAX_PAGE_SIZE),
+        'type': args.get('type') or None,
+        'cursor': decode_cursor(args['cursor']) if args.get('cursor') else None,
+        'since': None,
+        'until': None
+    }
+    for key in ('since', 'until'):
+        if args.get(key):
+            try:
+                query[key] = parse_timestamp(args[key])
+            except ValueError:
+                raise PaginationError(f'{key} must be an ISO 8601 timestamp')
+    return query
+
+def _event_key(event):
+    return (parse_timestamp(event['timestamp']), event['id'])
+
+def paginate_events(events, query):
+    """Apply event filters and keyset pagination to an in-memory event list.
+
+    Events are ordered newest first by (timestamp, id), matching GET /api/events
+    on SQL Server. events must already be stored in that order, as the
+    in-memory apps keep them (ids, timestamps and queue order are assigned
+    together at publish). The cursor and until bounds are found by binary
+    search and the list is walked backwards from there, stopping after
+    limit + 1 matches or at since, so a page never parses or sorts the full
+    history. Returns the page and the cursor for the next one (or None).
+    """
+    since, until, cursor, limit = query['since'], query['until'], query['cursor'], query['limit']
+    end = len(events)
+    if cursor:
+        end = bisect_left(events, cursor, hi=end, key=_event_key)
+    if until:
+        # (until,) sorts before every (until, id) key, so this excludes timestamps >= until
+        end = bisect_left(events, (until,), hi=end, key=_event_key)
+
+    page = []
+    for index in range(end - 1, -1, -1):
+        event = events[index]
+        if since and parse_timestamp(event['timestamp']) < since:
+            break
+        if query['type'] and event['type'] != query['type']:
+            continue
+        page.append(event)
+        if len(page) > limit:
+            break
+
+    next_cursor = None
+    if len(page) > limit:
+        del page[limit:]
+        next_cursor = encode_cursor(page[-1]['timestamp'], page[-1]['id'])
+    return page, next_cursor
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+class ReadCache:
+    """Thread-safe read-through cache with a TTL and LRU eviction beyond max_entries.
+
+    Entries can carry a tag (e.g. a collection ETag); a lookup with a
+    different tag is a miss, so a local write invalidates without a call.
+    Concurrent misses on the same key share one load instead of all hitting
+    the database. ttl <= 0 disables caching: every read goes to the loader.
+    """
+
+    def __init__(self, max_entries=256, ttl=30.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def _get(self, key, tag):
+        """Cached value, or None when missing, expired or stored under another tag (lock held)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, entry_tag, value = entry
+        if entry_tag != tag or time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.stats['expirations' if entry_tag == tag else 'invalidations'] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value, tag=None):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, tag, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def get_or_load(self, key, loader, tag=None):
+        """Cached value, or loader() stored under tag; one caller loads while the others wait for it"""
+        while True:
+            with self._lock:
+                value = self._get(key, tag)
+                if value is not None:
+                    self.stats['hits'] += 1
+                    return value
+                loading = self._loading.get(key)
+                if loading is None:
+                    self.stats['misses'] += 1
+                    loading = self._loading[key] = threading.Event()
+                    break
+            # Another request is loading this key; use its result (or retry if it failed)
+            loading.wait()
+        try:
+            value = loader()
+            self.put(key, value, tag)
+            return value
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when key is None"""
+        with self._lock:
+            if key is None:
+                self.stats['invalidations'] += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(key, None) is not None:
+                self.stats['invalidations'] += 1
+
+    def status(self):
+        """Cache counters for health reporting"""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hit_ratio': round(self.stats['hits'] / lookups, 3) if lookups else None,
+                **self.stats
+            }
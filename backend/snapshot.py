@@ -0,0 +1,226 @@
+import os
+import sys
+import struct
+import threading
+import time
+import zlib
+import logging
+from array import array
+
+import json_codec
+from event_log import lock_directory
+
+logger = logging.getLogger(__name__)
+
+# File layout: magic, format version, CRC32 of the body, then the body as
+# length-prefixed, zlib-compressed sections in SECTIONS order
+SNAPSHOT_HEADER = struct.Struct('<8sHI')
+SECTION_HEADER = struct.Struct('<Q')
+SNAPSHOT_MAGIC = b'FTSNAP\x00\x00'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PREFIX = 'snapshot-'
+SNAPSHOT_SUFFIX = '.bin'
+
+COLUMNS = (('ids', 'q'), ('user_ids', 'q'), ('amount_cents', 'q'), ('created_at_us', 'q'), ('type_codes', 'H'))
+SECTIONS = ('meta', 'users', 'events', 'type_names') + tuple(name for name, _ in COLUMNS)
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is truncated, corrupt or of an unknown version"""
+
+def write_snapshot(path, state, meta):
+    """Write an InMemoryRepository.export_state() copy atomically (temp file, fsync, rename)"""
+    columns = state['transactions']
+    sections = {
+        'meta': json_codec.dumpb(dict(meta, byteorder=sys.byteorder)),
+        'users': json_codec.dumpb(state['users']),
+        'events': json_codec.dumpb(state['events']),
+        'type_names': json_codec.dumpb(columns['type_names'])
+    }
+    for name, _ in COLUMNS:
+        sections[name] = columns[name].tobytes()
+
+    body = bytearray()
+    for name in SECTIONS:
+        data = zlib.compress(sections[name], 1)
+        body += SECTION_HEADER.pack(len(data))
+        body += data
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, zlib.crc32(body)))
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return SNAPSHOT_HEADER.size + len(body)
+
+def read_snapshot(path):
+    """Read a snapshot file; returns (state, meta) or raises SnapshotError"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < SNAPSHOT_HEADER.size:
+        raise SnapshotError(f'{path} is truncated')
+    magic, version, crc = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise SnapshotError(f'{path} is not a version {SNAPSHOT_VERSION} snapshot')
+    body = memoryview(data)[SNAPSHOT_HEADER.size:]
+    if zlib.crc32(body) != crc:
+        raise SnapshotError(f'{path} failed its checksum')
+
+    sections = {}
+    offset = 0
+    for name in SECTIONS:
+        length = SECTION_HEADER.unpack_from(body, offset)[0]
+        offset += SECTION_HEADER.size
+        sections[name] = zlib.decompress(body[offset:offset + length])
+        offset += length
+
+    meta = json_codec.loads(sections['meta'])
+    columns = {'type_names': json_codec.loads(sections['type_names'])}
+    for name, typecode in COLUMNS:
+        column = array(typecode)
+        column.frombytes(sections[name])
+        if meta['byteorder'] != sys.byteorder:
+            column.byteswap()
+        columns[name] = column
+    state = {
+        'users': json_codec.loads(sections['users']),
+        'events': json_codec.loads(sections['events']),
+        'transactions': columns
+    }
+    return state, meta
+
+class Snapshotter:
+    """Periodic snapshots of an InMemoryRepository, paired with an EventLog position.
+
+    A background thread copies the repository state every interval seconds
+    (once at least min_events new events have been stored) and writes it as a
+    compact binary file, so request handlers and the event consumer never wait
+    on serialization or disk. The snapshot records the event log position it
+    covers; on startup load() restores the newest valid snapshot and the
+    caller replays only the log tail after that position.
+
+    Only the process that has the event log open writes snapshots, and
+    start() also locks the snapshot directory, so two servers never write and
+    prune snapshots built from different views of the log.
+    """
+
+    def __init__(self, directory, repository, event_log, interval=300.0, min_events=1000, retain=2):
+        self.directory = directory
+        self.repository = repository
+        self.event_log = event_log
+        self.interval = interval
+        self.min_events = min_events
+        self.retain = max(1, retain)
+        self._last_events = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._dir_lock = None
+        self.stats = {'snapshots': 0, 'failures': 0, 'last_snapshot_ms': None, 'last_snapshot_bytes': None,
+                      'last_snapshot_at': None}
+
+    def _snapshots(self):
+        """Snapshot file names, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(n for n in os.listdir(self.directory)
+                      if n.startswith(SNAPSHOT_PREFIX) and n.endswith(SNAPSHOT_SUFFIX))
+
+    def load(self):
+        """Load the newest readable snapshot into the repository; returns its meta or None"""
+        for name in reversed(self._snapshots()):
+            path = os.path.join(self.directory, name)
+            try:
+                state, meta = read_snapshot(path)
+            except (SnapshotError, OSError, ValueError, KeyError, zlib.error, struct.error) as e:
+                logger.warning(f"Skipping unreadable snapshot {path}: {e}")
+                continue
+            self.repository.load_state(state)
+            self._last_events = meta['events']
+            return meta
+        return None
+
+    def snapshot(self, force=False):
+        """Write a snapshot now if enough events arrived since the last one; returns its path or None"""
+        with self._lock:
+            if not self.event_log.is_open:
+                logger.warning("Not writing a snapshot: the event log is not open in this process")
+                return None
+            if not force and len(self.repository.events) - self._last_events < self.min_events:
+                return None
+            started = time.perf_counter()
+            # Take the log position first: everything logged before it is already in the repository
+            segment, offset = self.event_log.position()
+            state = self.repository.export_state()
+            last_event_id = max((event['id'] for event in state['events']), default=0)
+            meta = {
+                'created_at': time.time(),
+                'log_position': [segment, offset],
+                'last_event_id': last_event_id,
+                'events': len(state['events']),
+                'users': len(state['users']),
+                'transactions': len(state['transactions']['ids'])
+            }
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{SNAPSHOT_PREFIX}{segment:08d}-{offset:012d}{SNAPSHOT_SUFFIX}')
+            try:
+                size = write_snapshot(path, state, meta)
+            except OSError as e:
+                self.stats['failures'] += 1
+                logger.error(f"Error writing snapshot {path}: {e}")
+                return None
+            self._last_events = meta['events']
+            self._prune()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stats['snapshots'] += 1
+            self.stats['last_snapshot_ms'] = round(elapsed_ms, 1)
+            self.stats['last_snapshot_bytes'] = size
+            self.stats['last_snapshot_at'] = meta['created_at']
+            logger.info(f"📸 Snapshot of {meta['events']} events written to {path} in {elapsed_ms:.0f} ms")
+            return path
+
+    def _prune(self):
+        for name in self._snapshots()[:-self.retain]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError as e:
+                logger.warning(f"Could not remove old snapshot {name}: {e}")
+
+    def start(self):
+        """Lock the snapshot directory and start the periodic snapshot thread"""
+        if self._thread is None:
+            if self._dir_lock is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._dir_lock = lock_directory(self.directory)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='snapshotter', daemon=True)
+            self._thread.start()
+
+    def stop(self, final_snapshot=True):
+        """Stop the thread; by default write a last snapshot so the next start replays nothing"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if final_snapshot:
+            self.snapshot(force=len(self.repository.events) != self._last_events)
+        if self._dir_lock is not None:
+            self._dir_lock.close()
+            self._dir_lock = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.snapshot()
+            except Exception as e:
+                self.stats['failures'] += 1
+                logger.error(f"Snapshot failed: {e}")
+
+    def status(self):
+        """Snapshot state for health reporting"""
+        return {
+            'snapshots_on_disk': len(self._snapshots()),
+            'events_since_snapshot': len(self.repository.events) - self._last_events,
+            **self.stats
+        }
@@ -0,0 +1,292 @@
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Room receiving every event, for operator dashboards
+ALL_EVENTS_ROOM = 'type:*'
+
+# Upper bound on rooms a single client may join
+MAX_ROOMS_PER_CLIENT = 100
+
+def type_room(event_type):
+    return f'type:{event_type}'
+
+def user_room(user_id):
+    return f'user:{user_id}'
+
+def event_rooms(event):
+    """Rooms an event is delivered to: all-events, its type and its user (if any)"""
+    rooms = [ALL_EVENTS_ROOM, type_room(event['type'])]
+    data = event.get('data')
+    if isinstance(data, dict) and data.get('user_id') is not None:
+        rooms.append(user_room(data['user_id']))
+    return tuple(rooms)
+
+def parse_subscription(data):
+    """Turn a subscribe/unsubscribe payload ({'types': [...], 'user_ids': [...]}) into room names"""
+    data = data or {}
+    rooms = set()
+    for event_type in data.get('types') or []:
+        if isinstance(event_type, str) and event_type:
+            rooms.add(type_room(event_type))
+    for user_id in data.get('user_ids') or []:
+        try:
+            rooms.add(user_room(int(user_id)))
+        except (TypeError, ValueError):
+            continue
+    return rooms
+
+class EventBroadcaster:
+    """Coalesces published events into events_batch Socket.IO frames.
+
+    Events are buffered for window_ms (or until max_batch_size is reached)
+    and each window is sent as one {'seq', 'events'} frame per group of
+    clients with the same subscriptions, holding exactly the events in their
+    rooms, so a dashboard gets one frame per window however many users or
+    types the events span. With route_to_rooms (emitters that do not see the
+    clients, e.g. through a message queue) a window is instead one frame per
+    room with events, and a client in overlapping rooms can receive an event
+    more than once (events carry ids to deduplicate).
+
+    Clients that acknowledge frames with events_ack are flow controlled:
+    once more than max_client_lag windows sent to them are unacknowledged
+    they leave their rooms and are told to resync, so a slow dashboard cannot
+    back up the server. Reconnecting clients can instead catch up through
+    replay(), which streams the events they missed in events_replay chunks.
+    """
+
+    def __init__(self, socketio, window_ms=50, max_batch_size=500, max_client_lag=20,
+                 resume_chunk_size=500, resume_max_events=10000, namespace='/', route_to_rooms=False):
+        self.socketio = socketio
+        self.route_to_rooms = route_to_rooms
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_client_lag = max_client_lag
+        self.resume_chunk_size = resume_chunk_size
+        self.resume_max_events = resume_max_events
+        self.namespace = namespace
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._seq = 0
+        # Guards the per-sid room sets, which Socket.IO handlers change while flush() reads them
+        self._subscriptions_lock = threading.Lock()
+        self._subscriptions = {}
+        self._unacked = {}
+        self._lagging = set()
+        self._running = False
+        self.stats = {'frames': 0, 'events': 0, 'max_frame_size': 0, 'slow_consumers': 0,
+                      'replays': 0, 'replayed_events': 0, 'replay_resyncs': 0}
+
+    def start(self):
+        """Start the periodic flusher as a Socket.IO background task"""
+        if not self._running:
+            self._running = True
+            self.socketio.start_background_task(self._run)
+
+    def stop(self):
+        """Stop the flusher and send whatever is still buffered"""
+        self._running = False
+        self.flush()
+
+    def _run(self):
+        while self._running:
+            self.socketio.sleep(self.window)
+            self.flush()
+
+    def add(self, event):
+        """Buffer one event for the next frame"""
+        self.add_many([event])
+
+    def add_many(self, events):
+        """Buffer several events; flushes immediately once the frame is full"""
+        with self._buffer_lock:
+            self._buffer.extend(events)
+            full = len(self._buffer) >= self.max_batch_size
+        if full or not self._running:
+            self.flush()
+
+    def flush(self):
+        """Send buffered events: one frame (per max_batch_size events) per subscription group or room"""
+        with self._flush_lock:
+            with self._buffer_lock:
+                pending, self._buffer = self._buffer, []
+            if not pending:
+                return
+
+            room_events = {}
+            for event in pending:
+                for room in event_rooms(event):
+                    room_events.setdefault(room, []).append(event)
+
+            subscriptions = self._subscription_snapshot()
+            if self.route_to_rooms:
+                sent = {room: self._emit(events, room) for room, events in room_events.items()}
+                for sid, rooms in subscriptions.items():
+                    seqs = [sent[room] for room in rooms if room in sent]
+                    if seqs:
+                        self._track(sid, max(seqs))
+            else:
+                groups = {}
+                for sid, rooms in subscriptions.items():
+                    if rooms and sid not in self._lagging:
+                        groups.setdefault(rooms, []).append(sid)
+                for rooms, sids in groups.items():
+                    events = self._events_for(rooms, room_events, pending)
+                    if events:
+                        seq = self._emit(events, sids)
+                        for sid in sids:
+                            self._track(sid, seq)
+            self._shed_slow_consumers(subscriptions)
+
+    def _subscription_snapshot(self):
+        """{sid: frozenset of rooms}, copied under the subscriptions lock"""
+        with self._subscriptions_lock:
+            return {sid: frozenset(rooms) for sid, rooms in self._subscriptions.items()}
+
+    def _rooms(self, sid):
+        with self._subscriptions_lock:
+            return frozenset(self._subscriptions.get(sid, ()))
+
+    @staticmethod
+    def _events_for(rooms, room_events, pending):
+        """Events in any of rooms, each once and in publish order"""
+        if ALL_EVENTS_ROOM in rooms:
+            return pending if ALL_EVENTS_ROOM in room_events else []
+        matches = [room_events[room] for room in rooms if room in room_events]
+        if len(matches) <= 1:
+            return matches[0] if matches else []
+        selected = {id(event) for events in matches for event in events}
+        return [event for event in pending if id(event) in selected]
+
+    def _emit(self, events, to):
+        """Send events to a room or list of sids in frames of at most max_batch_size; returns the last seq"""
+        for start in range(0, len(events), self.max_batch_size):
+            batch = events[start:start + self.max_batch_size]
+            self._seq += 1
+            self.socketio.emit('events_batch', {'seq': self._seq, 'events': batch},
+                               to=to, namespace=self.namespace)
+            self.stats['frames'] += 1
+            self.stats['events'] += len(batch)
+            self.stats['max_frame_size'] = max(self.stats['max_frame_size'], len(batch))
+        return self._seq
+
+    def _track(self, sid, seq):
+        """Count one unacknowledged window for a flow-controlled client, by its last frame's seq"""
+        unacked = self._unacked.get(sid)
+        if unacked is not None and sid not in self._lagging:
+            unacked.append(seq)
+
+    def _shed_slow_consumers(self, subscriptions):
+        for sid, unacked in list(self._unacked.items()):
+            if sid in self._lagging or len(unacked) <= self.max_client_lag:
+                continue
+            self._lagging.add(sid)
+            self.stats['slow_consumers'] += 1
+            for room in subscriptions.get(sid, ()):
+                self.socketio.server.leave_room(sid, room, namespace=self.namespace)
+            self.socketio.emit('resync_required', {'reason': 'slow_consumer', 'seq': self._seq},
+                               to=sid, namespace=self.namespace)
+            logger.warning(f"Client {sid} has {len(unacked)} unacknowledged windows, paused live events")
+
+    def client_connected(self, sid):
+        """Register a client; it receives nothing until it subscribes"""
+        with self._subscriptions_lock:
+            self._subscriptions.setdefault(sid, set())
+
+    def client_disconnected(self, sid):
+        """Forget a client's subscriptions and flow-control state"""
+        with self._subscriptions_lock:
+            self._subscriptions.pop(sid, None)
+        self._unacked.pop(sid, None)
+        self._lagging.discard(sid)
+
+    def subscribe(self, sid, data):
+        """Join the rooms named by a subscribe payload; returns the client's rooms"""
+        requested = parse_subscription(data)
+        with self._subscriptions_lock:
+            current = self._subscriptions.setdefault(sid, set())
+            for room in requested - current:
+                if len(current) >= MAX_ROOMS_PER_CLIENT:
+                    break
+                current.add(room)
+                if sid not in self._lagging:
+                    self.socketio.server.enter_room(sid, room, namespace=self.namespace)
+            return sorted(current)
+
+    def unsubscribe(self, sid, data):
+        """Leave the rooms named by an unsubscribe payload; returns the client's rooms"""
+        requested = parse_subscription(data)
+        with self._subscriptions_lock:
+            current = self._subscriptions.setdefault(sid, set())
+            for room in requested & current:
+                current.discard(room)
+                self.socketio.server.leave_room(sid, room, namespace=self.namespace)
+            return sorted(current)
+
+    def ack(self, sid, seq):
+        """Record the last frame a client has processed (opts the client into flow control)"""
+        if not isinstance(seq, int) or sid in self._lagging:
+            return
+        unacked = self._unacked.setdefault(sid, deque())
+        while unacked and unacked[0] <= seq:
+            unacked.popleft()
+
+    def resume(self, sid):
+        """Put a client that resynced back into its rooms"""
+        if sid in self._lagging:
+            self._lagging.discard(sid)
+            for room in self._rooms(sid):
+                self.socketio.server.enter_room(sid, room, namespace=self.namespace)
+        if sid in self._unacked:
+            self._unacked[sid].clear()
+
+    def subscribed_to(self, sid, event):
+        """Whether an event falls in any of the client's rooms"""
+        return not self._rooms(sid).isdisjoint(event_rooms(event))
+
+    def replay(self, sid, last_event_id, events):
+        """Send a reconnecting client the events after last_event_id, in events_replay chunks.
+
+        events are the stored events after last_event_id, oldest first, fetched
+        with a limit of resume_max_events + 1; a longer gap is not streamed and
+        the client is told to resync from the REST API instead. Returns the
+        number of events sent.
+        """
+        if len(events) > self.resume_max_events:
+            self.stats['replay_resyncs'] += 1
+            self.socketio.emit('resync_required', {'reason': 'gap_too_large', 'last_event_id': last_event_id},
+                               to=sid, namespace=self.namespace)
+            return 0
+        rooms = self._rooms(sid)
+        events = [event for event in events if not rooms.isdisjoint(event_rooms(event))]
+        chunks = range(0, len(events), self.resume_chunk_size) or [0]
+        for start in chunks:
+            chunk = events[start:start + self.resume_chunk_size]
+            self.socketio.emit('events_replay', {
+                'events': chunk,
+                'last_event_id': chunk[-1]['id'] if chunk else last_event_id,
+                'done': start + self.resume_chunk_size >= len(events)
+            }, to=sid, namespace=self.namespace)
+            # Let other greenlets/threads run between chunks
+            self.socketio.sleep(0)
+        self.stats['replays'] += 1
+        self.stats['replayed_events'] += len(events)
+        return len(events)
+
+    def client_count(self):
+        """Connected clients"""
+        return len(self._subscriptions)
+
+    def status(self):
+        """Broadcast state for health reporting"""
+        return {
+            'seq': self._seq,
+            'buffered': len(self._buffer),
+            'clients': len(self._subscriptions),
+            'flow_controlled_clients': len(self._unacked),
+            'lagging_clients': len(self._lagging),
+            **self.stats
+        }
@@ -0,0 +1,98 @@
+import logging
+
+from flask import Response
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 500
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+def wants_ndjson(request):
+    """True when the client prefers newline-delimited JSON"""
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def wants_stream(request):
+    """True when the client asked for a streamed (unpaginated) response"""
+    return request.args.get('stream', '').lower() in ('1', 'true') or wants_ndjson(request)
+
+class RowIterator:
+    """Rows of a query pulled in fetchmany chunks; the connection goes back once exhausted or closed.
+
+    The query runs on construction, so its errors surface before the response
+    starts. Hand close to stream_response: a body that is never iterated
+    (HEAD requests, clients that disconnect first) runs no generator cleanup.
+    """
+
+    def __init__(self, conn, sql, params=(), chunk_size=STREAM_CHUNK_SIZE):
+        self._conn = conn
+        self._chunk_size = chunk_size
+        self._rows = iter(())
+        try:
+            self._cursor = conn.cursor()
+            self._cursor.execute(sql, params)
+        except Exception:
+            self.close()
+            raise
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        for row in self._rows:
+            return row
+        rows = self._cursor.fetchmany(self._chunk_size) if self._conn is not None else None
+        if not rows:
+            self.close()
+            raise StopIteration
+        self._rows = iter(rows)
+        return next(self._rows)
+
+    def close(self):
+        """Return the connection (idempotent)"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+def iter_rows(conn, sql, params=(), chunk_size=STREAM_CHUNK_SIZE):
+    """Run sql and iterate its rows in chunks; see RowIterator"""
+    return RowIterator(conn, sql, params, chunk_size)
+
+def _json_array(records):
+    yield '['
+    first = True
+    for record in records:
+        if first:
+            first = False
+            yield json_codec.dumps(record)
+        else:
+            yield ',' + json_codec.dumps(record)
+    yield ']'
+
+def _ndjson(records):
+    for record in records:
+        yield json_codec.dumps(record) + '\n'
+
+def stream_response(records, ndjson=False, on_close=None):
+    """Build a response that serializes records incrementally as a JSON array or NDJSON.
+
+    on_close runs when the server closes the response, whether or not the body was sent.
+    """
+    body = _ndjson(records) if ndjson else _json_array(records)
+
+    def generate():
+        try:
+            yield from body
+        except Exception as e:
+            # Headers are already sent; truncating the body is the only signal left
+            logger.error(f"Error while streaming response: {e}")
+        finally:
+            body.close()
+            if hasattr(records, 'close'):
+                records.close()
+
+    response = Response(generate(), mimetype=NDJSON_MIMETYPE if ndjson else 'application/json')
+    if on_close:
+        response.call_on_close(on_close)
+    return response
@@ -0,0 +1,193 @@
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Events handled per lane before its worker is handed back to the pool
+LANE_QUANTUM = 100
+
+class Countdown:
+    """Lets a caller wait until every event it dispatched has run its subscribers"""
+
+    def __init__(self):
+        self._remaining = 0
+        self._done = threading.Condition()
+
+    def add(self):
+        with self._done:
+            self._remaining += 1
+
+    def done(self):
+        with self._done:
+            self._remaining -= 1
+            if not self._remaining:
+                self._done.notify_all()
+
+    def wait(self, timeout=None):
+        """True once all dispatched events are handled, False on timeout"""
+        with self._done:
+            return self._done.wait_for(lambda: not self._remaining, timeout)
+
+class SubscriberDispatcher:
+    """Runs event subscribers on a bounded worker pool.
+
+    Events of the same type are delivered in publish order (one lane per
+    type, drained by at most one worker at a time); each callback runs at
+    most per_subscriber_limit invocations concurrently across lanes.
+    """
+
+    def __init__(self, max_workers=4, max_pending=10000, per_subscriber_limit=1, timeout=5.0, enqueue_timeout=5.0):
+        self.timeout = timeout
+        self.enqueue_timeout = enqueue_timeout
+        self.per_subscriber_limit = per_subscriber_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='subscriber')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._lanes = {}
+        self._active = set()
+        self._subscribers = {}
+        self._pending = 0
+        self._running = {}
+        self.stats = {'dispatched': 0, 'completed': 0, 'failed': 0, 'timed_out': 0, 'dropped': 0}
+        self.subscriber_stats = {}
+
+    def _subscriber(self, callback):
+        """(limit, stats, label) for a callback, keyed by the callback object itself.
+
+        The label names it in status(): its __qualname__ (partials and other
+        callables without one use repr), numbered if another callback has it.
+        """
+        with self._lock:
+            subscriber = self._subscribers.get(callback)
+            if subscriber is None:
+                label = getattr(callback, '__qualname__', None) or repr(callback)
+                if label in self.subscriber_stats:
+                    label = f'{label}#{len(self._subscribers) + 1}'
+                stats = self.subscriber_stats[label] = {'calls': 0, 'failures': 0, 'timeouts': 0,
+                                                        'total_ms': 0.0, 'max_ms': 0.0}
+                subscriber = self._subscribers[callback] = (
+                    threading.BoundedSemaphore(self.per_subscriber_limit), stats, label)
+            return subscriber
+
+    def dispatch(self, event, callbacks, countdown=None):
+        """Queue an event for its subscribers; blocks while max_pending events are outstanding.
+
+        countdown (a Countdown) is counted down once the event's subscribers have run.
+        """
+        if not self._slots.acquire(timeout=self.enqueue_timeout):
+            with self._lock:
+                self.stats['dropped'] += 1
+            logger.error(f"Subscriber backlog full, dropped {event['type']} for {len(callbacks)} subscribers")
+            return False
+        event_type = event['type']
+        if countdown:
+            countdown.add()
+        with self._lock:
+            self._lanes.setdefault(event_type, deque()).append((event, callbacks, countdown))
+            self._pending += 1
+            self.stats['dispatched'] += 1
+            start_lane = event_type not in self._active
+            if start_lane:
+                self._active.add(event_type)
+        if start_lane:
+            self._executor.submit(self._drain, event_type)
+        return True
+
+    def _drain(self, event_type):
+        clean_exit = False
+        try:
+            for _ in range(LANE_QUANTUM):
+                with self._lock:
+                    lane = self._lanes.get(event_type)
+                    if not lane:
+                        self._active.discard(event_type)
+                        clean_exit = True
+                        return
+                    event, callbacks, countdown = lane.popleft()
+                try:
+                    for callback in callbacks:
+                        self._invoke(callback, event)
+                except Exception as e:
+                    logger.error(f"Error dispatching {event_type}: {e}")
+                finally:
+                    if countdown:
+                        countdown.done()
+                    with self._lock:
+                        self._pending -= 1
+                    self._slots.release()
+            clean_exit = True
+        finally:
+            if not clean_exit:
+                # Free the lane so the next dispatch of this type starts a new drain
+                with self._lock:
+                    self._active.discard(event_type)
+        # Yield the worker so one busy event type cannot starve the others
+        try:
+            self._executor.submit(self._drain, event_type)
+        except RuntimeError:
+            # Executor is shutting down; finish the lane on this worker
+            self._drain(event_type)
+
+    def _invoke(self, callback, event):
+        limit, stats, label = self._subscriber(callback)
+        worker = threading.get_ident()
+        with limit:
+            started = time.perf_counter()
+            with self._lock:
+                self._running[worker] = (label, event['type'], started)
+            try:
+                callback(event)
+                failed = False
+            except Exception as e:
+                failed = True
+                logger.error(f"Error in event callback: {e}")
+            finally:
+                with self._lock:
+                    self._running.pop(worker, None)
+            elapsed = time.perf_counter() - started
+
+        elapsed_ms = elapsed * 1000
+        timed_out = elapsed > self.timeout
+        with self._lock:
+            stats['calls'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            if failed:
+                stats['failures'] += 1
+                self.stats['failed'] += 1
+            else:
+                self.stats['completed'] += 1
+            if timed_out:
+                stats['timeouts'] += 1
+                self.stats['timed_out'] += 1
+        if timed_out:
+            # Python threads cannot be interrupted, so overruns are accounted rather than cancelled
+            logger.warning(f"Subscriber {label} took {elapsed_ms:.0f} ms for {event['type']}")
+
+    def running(self):
+        """(label, event type, seconds so far) for each callback running now, longest first"""
+        now = time.perf_counter()
+        with self._lock:
+            running = [(label, event_type, now - started) for label, event_type, started in self._running.values()]
+        return sorted(running, key=lambda call: call[2], reverse=True)
+
+    def shutdown(self, wait=True):
+        """Stop accepting work; with wait=True let queued events finish first"""
+        if wait:
+            deadline = time.monotonic() + self.timeout
+            while self._pending and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self._executor.shutdown(wait=wait)
+
+    def status(self):
+        """Dispatcher state for health reporting"""
+        return {
+            'pending': self._pending,
+            'lanes_active': len(self._active),
+            **self.stats,
+            'subscribers': {name: dict(stats, total_ms=round(stats['total_ms'], 3), max_ms=round(stats['max_ms'], 3))
+                            for name, stats in list(self.subscriber_stats.items())}
+        }
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import io from 'socket.io-client';
 import UserForm from './components/UserForm';
@@ -9,6 +9,13 @@ import ConnectionStatus from './components/ConnectionStatus';
 
 const API_BASE_URL = 'http://localhost:5001/api';
 
+// Add events (oldest first) to a newest-first list, skipping ones already shown
+const mergeEvents = (incoming, prevEvents) => {
+  const seen = new Set(prevEvents.map(event => event.id));
+  const fresh = incoming.filter(event => !seen.has(event.id));
+  return [...fresh.reverse(), ...prevEvents];
+};
+
 function App() {
   const [users, setUsers] = useState([]);
   const [events, setEvents] = useState([]);
@@ -16,6 +23,15 @@ function App() {
   const [isConnected, setIsConnected] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const lastEventId = useRef(null);
+
+  const trackEvents = (incoming) => {
+    incoming.forEach(event => {
+      if (lastEventId.current === null || event.id > lastEventId.current) {
+        lastEventId.current = event.id;
+      }
+    });
+  };
 
   useEffect(() => {
     // Initialize socket connection
@@ -25,6 +41,12 @@ function App() {
     // Socket event handlers
     newSocket.on('connect', () => {
       setIsConnected(true);
+      // The dashboard shows every event type
+      newSocket.emit('subscribe', { types: ['*'] });
+      // After a reconnect, catch up on what was missed instead of reloading everything
+      if (lastEventId.current !== null) {
+        newSocket.emit('resume', { last_event_id: lastEventId.current });
+      }
       console.log('Connected to server');
     });
 
@@ -37,6 +59,22 @@ function App() {
       setEvents(prevEvents => [event, ...prevEvents]);
     });
 
+    newSocket.on('events_batch', (batch) => {
+      trackEvents(batch.events);
+      setEvents(prevEvents => mergeEvents(batch.events, prevEvents));
+      newSocket.emit('events_ack', { seq: batch.seq });
+    });
+
+    newSocket.on('events_replay', (replay) => {
+      trackEvents(replay.events);
+      setEvents(prevEvents => mergeEvents(replay.events, prevEvents));
+    });
+
+    newSocket.on('resync_required', () => {
+      loadEvents();
+      newSocket.emit('events_resume');
+    });
+
     newSocket.on('message', (data) => {
       console.log('Server message:', data);
     });
@@ -66,6 +104,7 @@ function App() {
   const loadEvents = async () => {
     try {
       const response = await axios.get(`${API_BASE_URL}/events`);
+      trackEvents(response.data);
       setEvents(response.data);
     } catch (err) {
       console.error('Error loading events:', err);